@@ -1,13 +1,48 @@
 # -*- coding: utf-8 -*-
 import os
+import argparse
+import ast
+import contextlib
+import inspect
+import json
+import multiprocessing
+import queue
+import random
+import re
+import subprocess
+import textwrap
+import threading
+import time
+import wave
+from collections import defaultdict
+import av
 import numpy as np
 import requests
+from av.video.frame import PictureType
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from contextlib import contextmanager
+from fractions import Fraction
 from manim import *
+from manim import __version__ as manim_version
+from manim.constants import RendererType
+from manim.renderer.cairo_renderer import CairoRenderer
+from manim.scene.scene_file_writer import SceneFileWriter
+from manim.utils.exceptions import EndSceneEarlyException
+from manim.utils.family import extract_mobject_family_members
+from manim.utils.file_ops import get_full_sound_file_path, write_to_movie
+from manim.utils.iterables import list_update
 import hashlib
+import shutil
 
 from moviepy import AudioFileClip
 
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:  # Windows: cache locks use msvcrt byte-range locking instead of flock
+    import msvcrt
+    fcntl = None
+
 # 自定义颜色
 MY_DARK_BLUE = "#1E3A8A"  # 深蓝色
 MY_LIGHT_GRAY = "#F3F4F6"  # 浅灰色
@@ -18,10 +53,146 @@ MY_RED = "#DC2626"  # 红色
 MY_WHITE = "#FFFFFF"  # 白色
 MY_BLACK = "#000000"  # 黑色
 
+FFMPEG_BIN = os.environ.get("FFMPEG_BIN", "ffmpeg")
+
+# --- Render Setup ---
+STILL_HOLDS = True  # Encode static waits as one still frame spanning the hold instead of N identical frames
+STILL_HOLD_MIN_FRAMES = 3  # Shorter holds are cheaper to write normally
+SNAPSHOT_TRANSITIONS = True  # clear_and_reset fades a bitmap of the last frame instead of redrawing every mobject
+STATIC_LAYERS = True  # Rasterize still mobjects above the animated ones once per play and composite them per frame
+FRAME_RING_SIZE = 4  # Frame buffers shared by the rasterizer and the encoder thread; 0 draws into one buffer and copies
+
+# Shared Text/MathTex SVG cache that survives across render jobs; empty keeps manim's per-job media_dir
+GLYPH_CACHE_DIR = os.environ.get("GLYPH_CACHE_DIR", "")
+GLYPH_CACHE_MAX_BYTES = int(os.environ.get("GLYPH_CACHE_MAX_MB", "1024")) * 1024 * 1024  # 0 disables eviction
+
+# Draft render for the generate -> run -> repair loop: same code paths, a fraction of the pixels
+DRAFT_PIXEL_HEIGHT = 480
+DRAFT_PIXEL_WIDTH = 854
+DRAFT_FRAME_RATE = 15
+
+PROFILE_RENDER = True  # Write <media_dir>/<output_file>.profile.json after every render
+
+# Per-scene movies from --parallel renders, keyed by a fingerprint of everything the scene depends on,
+# so a revision only re-renders the scenes it touched; empty uses <media_dir>/scene_cache
+SCENE_CACHE_DIR = os.environ.get("SCENE_CACHE_DIR", "")
+SCENE_CACHE_MAX_BYTES = int(os.environ.get("SCENE_CACHE_MAX_MB", "4096")) * 1024 * 1024  # 0 disables eviction
+
+# Live HLS output (--hls): every finished scene is appended to <media_dir>/hls/<output_file>/index.m3u8
+HLS_SEGMENT_SECONDS = 6  # Target segment length; segments can only be cut at keyframes
+HLS_KEYFRAME_SECONDS = 3  # Longest keyframe gap in --hls renders, so no segment runs longer than the two added up
+
+# ABR ladder (--ladder): renditions encoded from the same frames into <media_dir>/ladder/<output_file>/master.m3u8
+ABR_LADDER = [(1080, "5000k"), (720, "2800k"), (480, "1200k")]  # (height, max video bitrate); rungs taller than the render are dropped
+ABR_AUDIO_BITRATE = "128k"
+
+# Soft subtitles (--soft-subtitles): narration as WebVTT/SRT cues next to the movie instead of burned-in Text
+SUBTITLE_SPLIT_SENTENCES = True  # One cue per sentence instead of one per narration line
+SUBTITLE_MAX_CHARS = 40  # Longer sentences are split again at commas
+SUBTITLE_NAME = "中文"
+SUBTITLE_LANGUAGE = "zh"  # BCP 47, for the HLS subtitle rendition
+SUBTITLE_MP4_LANGUAGE = "chi"  # ISO 639-2, for the mp4 subtitle track
+
 # --- TTS Caching Setup ---
-CACHE_DIR = "07/audio"
+# Point TTS_CACHE_DIR at one shared directory so every render worker reuses the same narration
+CACHE_DIR = os.environ.get("TTS_CACHE_DIR", "07/audio")
 os.makedirs(CACHE_DIR, exist_ok=True)
 
+TTS_INDEX_FILE = os.path.join(CACHE_DIR, "index.json")  # hash -> duration/size/codec, avoids probing on hits
+TTS_CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_MB", "2048")) * 1024 * 1024  # 0 disables eviction
+TTS_CACHE_MIN_AGE = 3600  # Seconds; files used more recently are never evicted (renders in progress)
+
+# Voice settings are part of the cache key; empty values use the server defaults
+TTS_PROVIDER = ""
+TTS_VOICE = ""
+TTS_SPEED = 1.0
+TTS_FORMAT = "mp3"
+
+# Override with TTS_BASE_URL / TTS_TOKEN, e.g. to point at the local stand-in: python 05_tts_stub.py serve
+TTS_TOKEN = os.environ.get("TTS_TOKEN", "123456")
+TTS_BASE_URL = os.environ.get("TTS_BASE_URL", "https://javalinux.explanation.fun/api/manim/tts")
+TTS_PREFETCH_WORKERS = 8  # Parallel downloads before the first frame
+TTS_MAX_CONCURRENCY = 8  # Max in-flight requests (and pooled connections) per client
+TTS_MAX_RETRIES = 4  # Retries on timeouts, connection errors, 429 and 5xx
+TTS_BACKOFF_SECONDS = 0.5  # Base delay, doubled on every retry
+TTS_TIMEOUT = 60  # Seconds per attempt
+TTS_ALLOW_SILENT = False  # True: a line that still fails after retries renders silent instead of aborting
+
+# Narration is mixed by ffmpeg from clips normalized once to this format (<hash>.pcm.wav next to the TTS file)
+AUDIO_SAMPLE_RATE = 48000
+AUDIO_CHANNELS = 2
+
+
+class RenderProfiler:
+    """
+    Wall-clock breakdown of one render: per pipeline phase, per scene, per play/wait call,
+    plus counters (frames, cache hits/misses). Thread-safe, since TTS prefetch runs in a pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.perf_counter()
+            self.phases = defaultdict(lambda: {"seconds": 0.0, "calls": 0})
+            self.counters = defaultdict(int)
+            self.scenes = []
+            self.calls = []
+
+    @contextmanager
+    def phase(self, name):
+        """Times the enclosed block under phase name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            self.phases[name]["seconds"] += seconds
+            self.phases[name]["calls"] += 1
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def add_scene(self, **entry):
+        with self._lock:
+            self.scenes.append(entry)
+
+    def add_call(self, **entry):
+        with self._lock:
+            self.calls.append(entry)
+
+    def report(self):
+        """The whole profile as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                "wall_seconds": time.perf_counter() - self.started,
+                "phases": {name: dict(value) for name, value in sorted(self.phases.items())},
+                "counters": dict(self.counters),
+                "scenes": list(self.scenes),
+                "calls": list(self.calls),
+            }
+
+    def write(self, path, **extra):
+        report = self.report()
+        report.update(extra)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return report
+
+
+profiler = RenderProfiler()
+
+
+class TTSError(RuntimeError):
+    """Raised when a TTS line could not be fetched after all retries."""
+
 
 class CustomVoiceoverTracker:
     """Tracks audio path and duration for TTS."""
@@ -31,54 +202,483 @@ class CustomVoiceoverTracker:
         self.duration = duration
 
 
-def get_cache_filename(text):
-    """Generates a unique filename based on the text hash."""
-    text_hash = hashlib.md5(text.encode('utf-8')).hexdigest()
-    return os.path.join(CACHE_DIR, f"{text_hash}.mp3")
+def get_cache_key(text, voice=TTS_VOICE, provider=TTS_PROVIDER, speed=TTS_SPEED, fmt=TTS_FORMAT):
+    """Content address of a line: everything that changes the synthesized audio."""
+    payload = json.dumps([text, voice, provider, speed, fmt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_cache_filename(text, voice=TTS_VOICE, provider=TTS_PROVIDER, speed=TTS_SPEED, fmt=TTS_FORMAT):
+    """Generates a unique filename based on the cache key, sharded by its first two hex digits."""
+    key = get_cache_key(text, voice, provider, speed, fmt)
+    return os.path.join(CACHE_DIR, key[:2], f"{key}.{fmt}")
 
 
 @contextmanager
-def custom_voiceover_tts(text, token="123456", base_url="https://javalinux.explanation.fun/api/manim/tts"):
+def file_lock(path):
+    """
+    Exclusive lock on path, shared by every process and thread using the cache: flock where
+    available, otherwise (Windows) a msvcrt lock on the file's first byte.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after about 10 s; keep waiting like flock does
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def get_lock_filename(cache_file):
+    """Lock striped over 256 files so lock files never have to be cleaned up."""
+    return os.path.join(CACHE_DIR, "locks", f"{os.path.basename(cache_file)[:2]}.lock")
+
+
+class TTSClient:
     """
-    Fetches TTS audio, caches it, and provides path and duration.
+    Reusable TTS client: one pooled keep-alive session, bounded concurrency,
+    exponential backoff on transient failures and per-request latency metrics.
+    """
+
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, token=TTS_TOKEN, base_url=TTS_BASE_URL, max_concurrency=TTS_MAX_CONCURRENCY,
+                 max_retries=TTS_MAX_RETRIES, backoff=TTS_BACKOFF_SECONDS, timeout=TTS_TIMEOUT):
+        self.token = token
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._metrics_lock = threading.Lock()
+        self.metrics = []  # One dict per download: latency, attempts, bytes, ok
+
+    def download(self, text, dest, voice=TTS_VOICE, provider=TTS_PROVIDER, speed=TTS_SPEED, fmt=TTS_FORMAT):
+        """
+        Streams the audio for text into dest, retrying transient failures.
+        Writes to a temporary file first so a partial download is never taken for a cache hit.
+        Raises TTSError once all retries are used up.
+        """
+        # URL encode the input text to handle special characters
+        input_text_encoded = requests.utils.quote(text)
+        url = f"{self.base_url}?token={self.token}&input={input_text_encoded}"
+        if provider:
+            url += f"&platform={requests.utils.quote(provider)}"
+        if voice:
+            url += f"&voice_id={requests.utils.quote(voice)}"
+        if speed != 1.0:
+            url += f"&speed={speed}"
+        if fmt != "mp3":
+            url += f"&format={fmt}"
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp_file = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        start = time.perf_counter()
+        attempt = 0
+        size = 0
+        try:
+            while True:
+                attempt += 1
+                try:
+                    with self._slots, self.session.get(url, stream=True, timeout=self.timeout) as response:
+                        response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
+                        size = 0
+                        with open(tmp_file, "wb") as f:
+                            for chunk in response.iter_content(chunk_size=8192):
+                                if chunk:
+                                    f.write(chunk)
+                                    size += len(chunk)
+                    os.replace(tmp_file, dest)
+                    break
+                except requests.exceptions.RequestException as e:
+                    if attempt > self.max_retries or not self._is_transient(e):
+                        raise TTSError(f"TTS failed after {attempt} attempt(s): {e}") from e
+                    delay = self.backoff * 2 ** (attempt - 1) + random.uniform(0, self.backoff)
+                    print(f"TTS attempt {attempt} failed ({e}), retrying in {delay:.1f}s...")
+                    time.sleep(delay)
+        except TTSError:
+            self._record(text, start, attempt, 0, False)
+            raise
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+        self._record(text, start, attempt, size, True)
+        return dest
+
+    def _is_transient(self, error):
+        if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError,
+                              requests.exceptions.ChunkedEncodingError)):
+            return True
+        response = getattr(error, "response", None)
+        return response is not None and response.status_code in self.RETRY_STATUS
+
+    def _record(self, text, start, attempts, size, ok):
+        with self._metrics_lock:
+            self.metrics.append({
+                "text": text[:30],
+                "latency": time.perf_counter() - start,
+                "attempts": attempts,
+                "bytes": size,
+                "ok": ok,
+            })
+
+    def summary(self):
+        """Aggregated latency/retry numbers for all downloads so far."""
+        with self._metrics_lock:
+            metrics = list(self.metrics)
+        if not metrics:
+            return {"requests": 0}
+        latencies = sorted(m["latency"] for m in metrics)
+        return {
+            "requests": len(metrics),
+            "failed": sum(1 for m in metrics if not m["ok"]),
+            "retries": sum(m["attempts"] - 1 for m in metrics),
+            "bytes": sum(m["bytes"] for m in metrics),
+            "latency_p50": latencies[len(latencies) // 2],
+            "latency_p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            "latency_max": latencies[-1],
+        }
+
+
+_tts_clients = {}
+_tts_clients_lock = threading.Lock()
+
+
+def get_tts_client(token=TTS_TOKEN, base_url=TTS_BASE_URL):
+    """Returns the shared client for this endpoint, creating it on first use."""
+    with _tts_clients_lock:
+        client = _tts_clients.get((token, base_url))
+        if client is None:
+            client = _tts_clients[(token, base_url)] = TTSClient(token=token, base_url=base_url)
+        return client
+
+
+class TTSCacheIndex:
+    """
+    Sidecar metadata for the TTS cache: hash -> duration, size, codec, created.
+    Loaded with a single file read per process so warm renders never probe audio.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(audio_file):
+        return os.path.splitext(os.path.basename(audio_file))[0]
+
+    def _read(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, audio_file):
+        """Returns the entry for audio_file, or None if missing or stale (size changed)."""
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._read()
+            entry = self._entries.get(self._key(audio_file))
+        if entry is None:
+            return None
+        try:
+            if os.path.getsize(audio_file) != entry["size"]:
+                return None
+        except OSError:
+            return None
+        return entry
+
+    def put(self, audio_file, duration, codec):
+        """Records metadata for audio_file and rewrites the index atomically."""
+        entry = {
+            "duration": duration,
+            "size": os.path.getsize(audio_file),
+            "codec": codec,
+            "created": time.time(),
+        }
+        self._update(lambda entries: entries.__setitem__(self._key(audio_file), entry))
+        return entry
+
+    def remove(self, audio_files):
+        """Drops the entries of evicted files."""
+        keys = [self._key(audio_file) for audio_file in audio_files]
+        self._update(lambda entries: [entries.pop(key, None) for key in keys])
+
+    def _update(self, change):
+        with self._lock, file_lock(os.path.join(os.path.dirname(self.path), "locks", "index.lock")):
+            # Re-read under the lock so entries written by other workers are kept
+            entries = self._read()
+            change(entries)
+            self._entries = entries
+
+            tmp_file = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp_file, self.path)
+
+
+tts_index = TTSCacheIndex(TTS_INDEX_FILE)
+
+
+def probe_audio(audio_file):
+    """Decodes the file header with MoviePy. Returns (duration, codec)."""
+    with profiler.phase("audio_probe"):
+        clip = AudioFileClip(audio_file)
+        try:
+            duration = clip.duration
+        finally:
+            clip.close()
+    return duration, os.path.splitext(audio_file)[1].lstrip(".")
+
+
+def probe_movie(movie_file):
+    """
+    Returns (video seconds, has audio). The length is where the last video frame ends (its pts plus
+    duration), not the container's declared duration, which can be shorter than the frames it holds.
+    """
+    with av.open(movie_file) as container:
+        stream = container.streams.video[0]
+        last = max((packet for packet in container.demux(stream) if packet.pts is not None),
+                   key=lambda packet: packet.pts, default=None)
+        end = last.pts + last.duration if last is not None else 0
+        return float(end * stream.time_base), bool(container.streams.audio)
+
+
+def get_audio_metadata(audio_file):
+    """Returns the index entry for audio_file, probing and recording it only on an index miss."""
+    entry = tts_index.get(audio_file)
+    if entry is None:
+        duration, codec = probe_audio(audio_file)
+        entry = tts_index.put(audio_file, duration, codec)
+    return entry
+
+
+def touch_cache_file(cache_file):
+    """Marks a cache entry as recently used for LRU eviction."""
+    try:
+        os.utime(cache_file)
+    except OSError:
+        pass
+
+
+def evict_lru(directory, max_bytes, min_age, is_entry=lambda name: True, lock_for=None):
+    """
+    Deletes least recently used files under directory until it fits in max_bytes.
+    Files used within min_age seconds are kept even if that leaves the directory over the cap.
+    lock_for(path), if given, names the lock held while a file is deleted.
+    Returns (removed paths, remaining bytes).
+    """
+    files = []
+    for root, dirs, names in os.walk(directory):
+        dirs[:] = [d for d in dirs if d != "locks"]
+        for name in names:
+            if name.endswith((".tmp", ".lock")) or not is_entry(name):
+                continue  # In-flight writes and bookkeeping files are never evicted
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    removed = []
+    if max_bytes <= 0 or total <= max_bytes:
+        return removed, total
+
+    now = time.time()
+    for mtime, size, path in sorted(files):
+        if total <= max_bytes or now - mtime < min_age:
+            break
+        with file_lock(lock_for(path)) if lock_for else contextlib.nullcontext():
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+        total -= size
+        removed.append(path)
+    return removed, total
+
+
+def evict_tts_cache(max_bytes=TTS_CACHE_MAX_BYTES, min_age=TTS_CACHE_MIN_AGE):
+    """Evicts least recently used audio down to max_bytes. Returns the number of files removed."""
+    removed, total = evict_lru(CACHE_DIR, max_bytes, min_age,
+                               # Only cache entries, not the index
+                               is_entry=lambda name: len(os.path.splitext(name)[0]) == 64,
+                               lock_for=get_lock_filename)
+    if removed:
+        tts_index.remove(removed)
+        print(f"Evicted {len(removed)} TTS cache file(s), cache now {total / 1024 / 1024:.1f} MB.")
+    # Normalized PCM copies are derived data with the same budget; they are rebuilt on demand
+    removed_pcm, total = evict_lru(CACHE_DIR, max_bytes, min_age,
+                                   is_entry=lambda name: name.endswith(".pcm.wav"),
+                                   lock_for=get_lock_filename)
+    if removed_pcm:
+        print(f"Evicted {len(removed_pcm)} normalized audio file(s), now {total / 1024 / 1024:.1f} MB.")
+    return len(removed) + len(removed_pcm)
+
+
+def fetch_tts(text, token=TTS_TOKEN, base_url=TTS_BASE_URL, voice=TTS_VOICE, provider=TTS_PROVIDER):
+    """
+    Downloads TTS audio for text into the cache, records its metadata and returns the cache path.
+    Holds the entry's lock while downloading so concurrent workers never fetch the same line twice.
+    Raises TTSError on failure.
+    """
+    cache_file = get_cache_filename(text, voice, provider)
+    with file_lock(get_lock_filename(cache_file)):
+        if os.path.exists(cache_file):
+            # Another worker fetched it while we were waiting for the lock
+            touch_cache_file(cache_file)
+            return cache_file
+        with profiler.phase("tts_fetch"):
+            get_tts_client(token, base_url).download(text, cache_file, voice=voice, provider=provider)
+        try:
+            # Probe once at download time; every later render reads the duration from the index
+            get_audio_metadata(cache_file)
+        except Exception as e:
+            print(f"Error processing audio file {cache_file}: {e}")
+    return cache_file
+
+
+def collect_voiceover_texts(scene_cls):
+    """
+    Scans the scene's source (or a single scene method's) for custom_voiceover_tts(...) calls
+    and returns their texts in order.
+    For a class, every class in its MRO that has source is scanned, so the subclasses built with
+    type() for --parallel parts and scheduler stages find the scenes of the class they render.
+    Handles both string literals and local names assigned from a string literal (voice_text_0N = "...").
+    """
+    if inspect.isclass(scene_cls):
+        owners = [cls for cls in scene_cls.__mro__ if not cls.__module__.startswith(("manim", "builtins"))]
+    else:
+        owners = [scene_cls]
+    sources = []
+    for owner in owners:
+        try:
+            sources.append(textwrap.dedent(inspect.getsource(owner)))
+        except (OSError, TypeError):
+            continue  # Built with type(): no source of its own
+    if not sources:
+        print(f"Could not read scene source for TTS prefetch: {scene_cls!r}")
+        return []
+
+    texts = []
+    for func in (node for source in sources for node in ast.walk(ast.parse(source))):
+        if not isinstance(func, ast.FunctionDef):
+            continue
+        # Local string constants, e.g. voice_text_01 = "..."
+        constants = {}
+        for node in ast.walk(func):
+            if (isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant)
+                    and isinstance(node.value.value, str)):
+                for target in node.targets:
+                    if isinstance(target, ast.Name):
+                        constants[target.id] = node.value.value
+        for node in ast.walk(func):
+            if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                    and node.func.id == "custom_voiceover_tts" and node.args):
+                continue
+            arg = node.args[0]
+            if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+                text = arg.value
+            elif isinstance(arg, ast.Name) and arg.id in constants:
+                text = constants[arg.id]
+            else:
+                continue  # Dynamic text, fetched lazily by the context manager
+            if text not in texts:
+                texts.append(text)
+    return texts
+
+
+def prefetch_tts(texts, token=TTS_TOKEN, base_url=TTS_BASE_URL, voice=TTS_VOICE, provider=TTS_PROVIDER,
+                 max_workers=TTS_PREFETCH_WORKERS):
+    """Downloads every uncached text in parallel. Returns the number of lines fetched."""
+    missing = []
+    for text in texts:
+        cache_file = get_cache_filename(text, voice, provider)
+        if os.path.exists(cache_file):
+            touch_cache_file(cache_file)  # Protect lines this render is about to use from eviction
+            profiler.count("tts_cache_hit")
+        else:
+            profiler.count("tts_cache_miss")
+            missing.append(text)
+    if not missing:
+        return 0
+
+    def fetch(text):
+        try:
+            fetch_tts(text, token=token, base_url=base_url, voice=voice, provider=provider)
+            return True
+        except TTSError as e:
+            # Left uncached; custom_voiceover_tts retries it when the scene reaches it
+            print(f"TTS prefetch failed for: {text[:30]}... ({e})")
+            return False
+
+    print(f"Prefetching TTS for {len(missing)} of {len(texts)} lines...")
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as pool:
+        fetched = sum(pool.map(fetch, missing))
+    print(f"TTS prefetch done: {fetched}/{len(missing)} downloaded. {get_tts_client(token, base_url).summary()}")
+    if fetched:
+        evict_tts_cache()  # Once per prefetch: it walks the whole cache
+    return fetched
+
+
+@contextmanager
+def custom_voiceover_tts(text, token=TTS_TOKEN, base_url=TTS_BASE_URL, voice=TTS_VOICE, provider=TTS_PROVIDER):
+    """
+    Provides path and duration for cached TTS audio, fetching it first if it was not prefetched.
     Usage: with custom_voiceover_tts("text") as tracker: ...
     """
-    cache_file = get_cache_filename(text)
+    cache_file = get_cache_filename(text, voice, provider)
     audio_file = cache_file  # Initialize audio_file
 
     if os.path.exists(cache_file):
         audio_file = cache_file
+        touch_cache_file(cache_file)
+        profiler.count("voiceover_cache_hit")
         print(f"Using cached TTS for: {text[:30]}...")
     else:
+        profiler.count("voiceover_cache_miss")
         print(f"Requesting TTS for: {text[:30]}...")
         try:
-            # URL encode the input text to handle special characters
-            input_text_encoded = requests.utils.quote(text)
-            url = f"{base_url}?token={token}&input={input_text_encoded}"
-
-            response = requests.get(url, stream=True, timeout=60)  # Added timeout
-            response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
-
-            with open(cache_file, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-            audio_file = cache_file
+            audio_file = fetch_tts(text, token=token, base_url=base_url, voice=voice, provider=provider)
             print("TTS downloaded and cached.")
 
-        except requests.exceptions.RequestException as e:
-            print(f"TTS API request failed: {e}")
+        except TTSError as e:
+            if not TTS_ALLOW_SILENT:
+                raise
+            print(f"TTS API request failed, rendering line silent: {e}")
             # Fallback: create a dummy tracker with zero duration
             tracker = CustomVoiceoverTracker(None, 0)
             yield tracker
             return  # Exit context manager
 
-    # Ensure audio file exists before processing with MoviePy
+    # Ensure audio file exists before reading its duration
     if audio_file and os.path.exists(audio_file):
         try:
-            clip = AudioFileClip(audio_file)
-            duration = clip.duration
-            clip.close()
+            duration = get_audio_metadata(audio_file)["duration"]
             print(f"Audio duration: {duration:.2f}s")
             tracker = CustomVoiceoverTracker(audio_file, duration)
         except Exception as e:
@@ -90,6 +690,10 @@ def custom_voiceover_tts(text, token="123456", base_url="https://javalinux.expla
         print(f"TTS audio file not found or not created: {audio_file}")
         tracker = CustomVoiceoverTracker(None, 0)
 
+    if SubtitleTrack.active is not None and tracker.duration > 0:
+        # The scene adds the audio right away, so the line starts at the current video time
+        SubtitleTrack.active.add(text, tracker.duration)
+
     try:
         yield tracker
     finally:
@@ -97,33 +701,1054 @@ def custom_voiceover_tts(text, token="123456", base_url="https://javalinux.expla
         pass
 
 
+def split_subtitle(text, max_chars=SUBTITLE_MAX_CHARS):
+    """Splits a narration line into sentences, and sentences longer than max_chars at commas."""
+    parts = []
+    for sentence in re.findall(r"[^。！？!?；]+[。！？!?；]*", text):
+        sentence = sentence.strip()
+        if len(sentence) <= max_chars:
+            parts += [sentence] if sentence else []
+            continue
+        chunk = ""
+        for clause in re.findall(r"[^，、]+[，、]*", sentence):
+            if chunk and len(chunk) + len(clause) > max_chars:
+                parts.append(chunk.strip())
+                chunk = ""
+            chunk += clause
+        parts.append(chunk.strip())
+    # A trailing emoji or bracket is not a cue of its own
+    for i in range(len(parts) - 1, 0, -1):
+        if not re.search(r"\w", parts[i]):
+            parts[i - 1] += parts.pop(i)
+    return parts
+
+
+class SubtitleTrack:
+    """
+    Narration cues (start, end, text) on the video timeline, written out as WebVTT and SRT.
+    While a track is active, custom_voiceover_tts adds every line it hands out. The audio carries
+    no word timings, so when a line is split into sentences each one gets the share of the line's
+    duration that its characters make up.
+    """
+    active = None  # Track custom_voiceover_tts records into; set by the scene being rendered
+
+    def __init__(self, clock, split_sentences=SUBTITLE_SPLIT_SENTENCES, max_chars=SUBTITLE_MAX_CHARS):
+        self.clock = clock  # Current video time in seconds
+        self.split_sentences = split_sentences
+        self.max_chars = max_chars
+        self.cues = []
+
+    def add(self, text, duration):
+        start = self.clock()
+        if self.cues and self.cues[-1][1] > start:
+            self.cues[-1] = (self.cues[-1][0], start, self.cues[-1][2])  # Never show two lines at once
+        parts = split_subtitle(text, self.max_chars) if self.split_sentences else [text.strip()]
+        weights = [len(re.sub(r"\s", "", part)) for part in parts]
+        for part, weight in zip(parts, weights):
+            end = start + duration * weight / sum(weights)
+            self.cues.append((start, end, part))
+            start = end
+
+    @staticmethod
+    def _timestamp(seconds, separator):
+        milliseconds = round(seconds * 1000)
+        hours, milliseconds = divmod(milliseconds, 3600000)
+        minutes, milliseconds = divmod(milliseconds, 60000)
+        return f"{hours:02d}:{minutes:02d}:{milliseconds // 1000:02d}{separator}{milliseconds % 1000:03d}"
+
+    def to_webvtt(self, header=None):
+        lines = ["WEBVTT"] + ([header] if header else []) + [""]
+        for start, end, text in self.cues:
+            lines += [f"{self._timestamp(start, '.')} --> {self._timestamp(end, '.')}", text, ""]
+        return "\n".join(lines)
+
+    def to_srt(self):
+        lines = []
+        for i, (start, end, text) in enumerate(self.cues, start=1):
+            lines += [str(i), f"{self._timestamp(start, ',')} --> {self._timestamp(end, ',')}", text, ""]
+        return "\n".join(lines)
+
+    def write(self, base_path):
+        """Writes <base_path>.vtt and <base_path>.srt and returns both paths."""
+        paths = f"{base_path}.vtt", f"{base_path}.srt"
+        for path, content in zip(paths, (self.to_webvtt(), self.to_srt())):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+        return paths
+
+
 # -----------------------------
-# CombinedScene：整合所有场景并添加字幕和音频
+# Audio timeline：旁白音轨由 ffmpeg 一次混合
 # -----------------------------
-class CombinedScene(MovingCameraScene):
+def normalize_audio_clip(audio_file):
     """
-    合并所有场景的 Manim 动画，用于讲解如何求解函数 f(x)=x^2 的切线方程。
+    Returns (path, duration) of a PCM WAV copy of audio_file at AUDIO_SAMPLE_RATE / AUDIO_CHANNELS,
+    transcoding it only the first time. TTS cache entries keep the copy next to the original;
+    any other file is keyed by its path and size.
     """
-    def construct(self):
-        # Use a scene-specific time tracker for updaters if needed outside TTS timing
-        self.scene_time_tracker = ValueTracker(0)
+    audio_file = os.path.abspath(audio_file)
+    key = os.path.splitext(os.path.basename(audio_file))[0]
+    if len(key) != 64:
+        key = hashlib.sha256(f"{audio_file}\0{os.path.getsize(audio_file)}".encode('utf-8')).hexdigest()
+    pcm_file = os.path.join(CACHE_DIR, key[:2], f"{key}.pcm.wav")
+    with file_lock(get_lock_filename(pcm_file)):
+        if not os.path.exists(pcm_file):
+            os.makedirs(os.path.dirname(pcm_file), exist_ok=True)
+            tmp_file = f"{pcm_file}.tmp"
+            with profiler.phase("audio_transcode"):
+                run_ffmpeg("-i", audio_file, "-vn", "-ac", str(AUDIO_CHANNELS), "-ar", str(AUDIO_SAMPLE_RATE),
+                           "-c:a", "pcm_s16le", "-f", "wav", tmp_file)
+            os.replace(tmp_file, pcm_file)
+    touch_cache_file(pcm_file)
+    with wave.open(pcm_file) as f:
+        return pcm_file, f.getnframes() / f.getframerate()
+
+
+def audio_mix_args(cues, start, duration, first_input):
+    """
+    ffmpeg inputs and filter graph that mix cues [(file, time, gain)] into one [a] stream covering
+    [start, start + duration) of the video timeline; input numbering starts at first_input.
+    Each clip is delayed (or trimmed, if it began before start) into place and the clips are summed
+    with amix. ffmpeg streams every input, so memory stays flat however long the lesson is.
+    """
+    inputs, labels, filters = [], [], []
+    for audio_file, cue_time, gain in cues:
+        pcm_file, clip_duration = normalize_audio_clip(audio_file)
+        offset = cue_time - start
+        if offset >= duration or offset + clip_duration <= 0:
+            continue  # Entirely outside this window
+        if offset < 0:
+            chain = f"[{first_input + len(labels)}:a]atrim=start={-offset:.6f},asetpts=PTS-STARTPTS"
+        else:
+            chain = f"[{first_input + len(labels)}:a]adelay={round(offset * 1000)}:all=1"
+        if gain:
+            chain += f",volume={gain}dB"
+        inputs += ["-i", pcm_file]
+        labels.append(f"[c{len(labels)}]")
+        filters.append(chain + labels[-1])
+
+    fit = f"apad=whole_dur={duration:.6f},atrim=0:{duration:.6f}[a]"
+    if not labels:
+        filters.append(f"anullsrc=r={AUDIO_SAMPLE_RATE}:cl=stereo,atrim=0:{duration:.6f}[a]")
+    elif len(labels) == 1:
+        filters.append(f"{labels[0]}{fit}")
+    else:
+        filters.append(f"{''.join(labels)}amix=inputs={len(labels)}:duration=longest:normalize=0,{fit}")
+    return inputs, ";".join(filters)
 
-        # --- Play Scenes Sequentially ---
-        self.play_scene_01()
-        self.clear_and_reset()
 
-        self.play_scene_02()
-        self.clear_and_reset()
+# -----------------------------
+# Glyph cache：跨场景、跨任务复用 Text / MathTex 的 SVG
+# -----------------------------
+_glyph_cache_dir = None
 
-        self.play_scene_03()
-        self.clear_and_reset()
 
-        self.play_scene_04()
-        self.clear_and_reset()
+def enable_glyph_cache(cache_dir=GLYPH_CACHE_DIR, max_bytes=GLYPH_CACHE_MAX_BYTES):
+    """
+    Points manim's Text and Tex SVG caches at a persistent directory shared by all jobs.
+    manim names those files by a hash of everything that shapes them: for Tex the full TeX source
+    (template, environment and expression), for Text the string with its font, slant, weight, colour,
+    size, line spacing and t2c/t2f/t2s/t2w. Tex colour is applied after loading, so one Tex entry serves
+    every colour; every Text colour is its own entry.
+    Parsed paths are memoized per process by SVGMobject, so repeats within a job cost nothing.
+    This is independent of config.disable_caching, which only controls partial-movie reuse.
+    Returns True if the shared cache is in use.
+    """
+    global _glyph_cache_dir
+    install_glyph_hooks()
+    if not cache_dir:
+        return False
+    config.tex_dir = os.path.join(cache_dir, "Tex")
+    config.text_dir = os.path.join(cache_dir, "texts")
+    os.makedirs(config.tex_dir, exist_ok=True)
+    os.makedirs(config.text_dir, exist_ok=True)
+    if _glyph_cache_dir != cache_dir:
+        _glyph_cache_dir = cache_dir
+        removed, total = evict_lru(cache_dir, max_bytes, TTS_CACHE_MIN_AGE)
+        if removed:
+            print(f"Evicted {len(removed)} glyph cache file(s), cache now {total / 1024 / 1024:.1f} MB.")
+    return True
+
+
+def _glyph_lock(kind, key):
+    """Lock for one shared-cache entry (key: the hash manim names its file by), or a no-op when the cache is per job."""
+    if not _glyph_cache_dir:
+        return contextlib.nullcontext()
+    stripe = hashlib.sha256(key.encode('utf-8')).hexdigest()[:2]
+    return file_lock(os.path.join(_glyph_cache_dir, "locks", f"{kind}-{stripe}.lock"))
+
+
+def install_glyph_hooks():
+    """
+    Wraps manim's TeX and Text SVG compilation to:
+    - time it for the render profile (latex_compile / text_layout phases),
+    - serialize the first compilation of each shared-cache entry across workers; manim writes
+      SVGs in place, so otherwise a second worker could load a half-written file,
+    - bump the file's mtime on every use for LRU eviction.
+    There is only ever one wrapper around manim's own functions. A worker that loads several copies of
+    this script (05_scheduler.py) re-points it at the copy being set up rather than stacking another:
+    nested wrappers would take the same entry's flock twice and deadlock on a shared cache.
+    """
+    from manim.mobject.text import tex_mobject
+    from manim.utils.tex_file_writing import tex_hash
+
+    if getattr(Text._text2svg, "_glyph_lock", None) is _glyph_lock:
+        return  # Already routed through this copy's lock and profiler
+    original_tex_to_svg_file = getattr(tex_mobject.tex_to_svg_file, "__wrapped__", tex_mobject.tex_to_svg_file)
+
+    def tex_to_svg_file(expression, environment=None, tex_template=None):
+        # The TeX source manim hashes into the file name, so entries that differ only by template never share a lock
+        template = tex_template or config["tex_template"]
+        source = (template.get_texcode_for_expression_in_env(expression, environment) if environment is not None
+                  else template.get_texcode_for_expression(expression))
+        with _glyph_lock("tex", tex_hash(source)), profiler.phase("latex_compile"):
+            svg_file = original_tex_to_svg_file(expression, environment=environment, tex_template=tex_template)
+        touch_cache_file(svg_file)
+        return svg_file
+
+    original_text2svg = getattr(Text._text2svg, "__wrapped__", Text._text2svg)
+
+    def _text2svg(self, color, *args, **kwargs):
+        with _glyph_lock("text", self._text2hash(color)), profiler.phase("text_layout"):
+            svg_file = original_text2svg(self, color, *args, **kwargs)
+        touch_cache_file(svg_file)
+        return svg_file
+
+    for hook, original in ((tex_to_svg_file, original_tex_to_svg_file), (_text2svg, original_text2svg)):
+        hook.__wrapped__ = original
+        hook._glyph_lock = _glyph_lock
+    tex_mobject.tex_to_svg_file = tex_to_svg_file
+    Text._text2svg = _text2svg
 
-        self.play_scene_05()
-        self.clear_and_reset()
 
+# -----------------------------
+# Renderer：CombinedScene 使用的渲染管线
+# -----------------------------
+class FrameRing:
+    """
+    Fixed set of frame buffers passed between the rasterizer and the file writer's encoder thread.
+    The camera draws straight into a free buffer, that buffer itself (not a copy) is queued for
+    encoding, and the writer puts it back once encoded. With every buffer in flight the rasterizer
+    waits, so at most `size` frames are ever queued and no frame memory is allocated after warm-up.
+    """
+
+    def __init__(self, shape, dtype, size):
+        self.buffers = [np.zeros(shape, dtype=dtype) for _ in range(size)]
+        self._free = queue.Queue()
+        for buffer in self.buffers:
+            self._free.put(buffer)
+        self._held = None  # Buffer the camera is drawing into, not handed over yet
+        self._in_flight = set()  # ids of buffers queued for encoding
+
+    def acquire(self):
+        """Buffer to draw the next frame into; blocks while every buffer waits to be encoded."""
+        if self._held is None:
+            start = time.perf_counter()
+            self._held = self._free.get()
+            profiler.add_time("frame_ring_wait", time.perf_counter() - start)
+        return self._held
+
+    def submit(self, frame):
+        """Marks the held buffer as queued for encoding. Returns False if frame is not the held buffer."""
+        if frame is not self._held:
+            return False
+        self._in_flight.add(id(frame))
+        self._held = None
+        return True
+
+    def release(self, frame):
+        """Called by the encoder once frame is encoded; ignores frames that are not ring buffers."""
+        if id(frame) in self._in_flight:
+            self._in_flight.discard(id(frame))
+            self._free.put(frame)
+
+
+class CombinedSceneFileWriter(SceneFileWriter):
+    """
+    SceneFileWriter that can write a frozen hold as a single still frame with a duration,
+    and that keeps narration as a list of (file, start time, gain) cues instead of decoding
+    and overlaying every clip into an in-memory track; the track is mixed once by ffmpeg
+    when the movie is combined.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._still_written = False
+        self._last_still = None  # (path, frame, num_frames) while the newest partial movie is a still
+        self.audio_cues = []
+        self.frame_ring = None  # Set by the renderer once it draws into ring buffers
+        self.ladder = None  # RenditionLadder fed with every frame written, when the scene renders one
+        self.subtitle_file = None  # SRT muxed into the movie as a soft subtitle track
+        self.keyframe_seconds = None  # Longest gap between keyframes in partial movies; None leaves it to the encoder
+
+    def open_partial_movie_stream(self, *args, **kwargs):
+        super().open_partial_movie_stream(*args, **kwargs)
+        if self.keyframe_seconds:
+            # Stream-copied HLS segments can only be cut at keyframes
+            self.video_stream.codec_context.gop_size = max(1, int(self.keyframe_seconds * config.frame_rate))
+
+    def encode_and_write_frame(self, frame, num_frames):
+        # Runs on manim's writer thread; the buffer can be drawn into again once it is encoded
+        super().encode_and_write_frame(frame, num_frames)
+        if self.ladder is not None:
+            self.ladder.add_frame(frame, num_frames)
+        if self.frame_ring is not None:
+            self.frame_ring.release(frame)
+
+    def add_sound(self, sound_file, time=None, gain=None, **kwargs):
+        if time is None:
+            # Same as manim: right after the audio added so far
+            time = max((cue_time + normalize_audio_clip(path)[1] for path, cue_time, _ in self.audio_cues), default=0.0)
+        self.audio_cues.append((get_full_sound_file_path(sound_file), time, gain))
+
+    def combine_to_movie(self):
+        partial_movie_files = [path for path in self.partial_movie_files if path is not None]
+        if self._last_still and partial_movie_files and partial_movie_files[-1] == self._last_still[0]:
+            # manim concatenates with dts=None, and the muxer then guesses the last frame's time from the
+            # frame rate instead of its pts: a movie ending in a sparse still declares itself short
+            path, frame, num_frames = self._last_still
+            self._encode_still(path, frame, num_frames, every_frame=True)
+        super().combine_to_movie()
+        if self.audio_cues and not self.movie_file_path.endswith(".gif"):
+            self.mux_audio()
+
+    def mux_audio(self):
+        """Mixes all cues onto the finished movie in a single ffmpeg pass (video is stream-copied), with the subtitles if any."""
+        movie_file = self.movie_file_path
+        duration, _ = probe_movie(movie_file)
+        inputs, graph = audio_mix_args(self.audio_cues, 0.0, duration, first_input=1)
+        subtitle_args = []
+        if self.subtitle_file:
+            subtitle_args = ["-map", f"{1 + len(inputs) // 2}:s", "-c:s", "mov_text",
+                             "-metadata:s:s:0", f"language={SUBTITLE_MP4_LANGUAGE}"]
+            inputs += ["-i", self.subtitle_file]
+        root, ext = os.path.splitext(movie_file)
+        tmp_file = f"{root}.audio{ext}"
+        with profiler.phase("audio_mux"):
+            run_ffmpeg("-i", movie_file, *inputs, "-filter_complex", graph,
+                       "-map", "0:v", "-map", "[a]", *subtitle_args,
+                       "-c:v", "copy", "-c:a", "aac", "-movflags", "+faststart", tmp_file)
+        os.replace(tmp_file, movie_file)
+
+    def write_still(self, frame, num_frames):
+        """
+        Replaces this play's partial movie with one encoded frame that lasts num_frames.
+        The frame is encoded at pts 0 and repeated at pts num_frames - 1, so the segment
+        has the right length while the encoder only sees two frames (the second is all skip blocks).
+        With keyframe_seconds set it is also repeated as a keyframe that often in between.
+        If the movie ends on it, combine_to_movie re-encodes it with every frame before concatenating.
+        """
+        path = self.partial_movie_file_path
+        # Close manim's stream for this play (nothing has been written to it yet) and take over the file
+        self.close_partial_movie_stream()
+        self._encode_still(path, frame, num_frames)
+        if self.ladder is not None:
+            self.ladder.add_frame(frame, num_frames)
+        self._still_written = True
+        self._last_still = (path, frame, num_frames)
+
+    def _encode_still(self, path, frame, num_frames, every_frame=False):
+        """Encodes frame as a num_frames long movie with the same codec settings as manim's partial movies,
+        so the final concat can stream-copy it."""
+        with av.open(path, mode="w") as container:
+            stream = container.add_stream("libx264", rate=Fraction(config.frame_rate).limit_denominator(1001),
+                                          options={"an": "1", "crf": "23"})
+            stream.pix_fmt = "yuv420p"
+            stream.width = config.pixel_width
+            stream.height = config.pixel_height
+            step = max(1, int(self.keyframe_seconds * config.frame_rate)) if self.keyframe_seconds else num_frames
+            # Converted once; the encoder copies the picture, so every pts can reuse it
+            picture = av.VideoFrame.from_ndarray(frame, format="rgba").reformat(format="yuv420p")
+            all_pts = range(num_frames) if every_frame else [*range(0, num_frames - 1, step), num_frames - 1]
+            for pts in all_pts:
+                picture.pts = pts
+                picture.pict_type = PictureType.I if pts % step == 0 else PictureType.NONE
+                for packet in stream.encode(picture):
+                    container.mux(packet)
+            for packet in stream.encode():
+                container.mux(packet)
+
+    def end_animation(self, allow_write=False):
+        if self._still_written:
+            # The still segment is already complete and closed
+            self._still_written = False
+            return
+        if allow_write:
+            self._last_still = None
+        super().end_animation(allow_write)
+
+
+class CombinedSceneRenderer(CairoRenderer):
+    """
+    Cairo renderer for CombinedScene.
+    Waits that manim already detects as frozen (a lone Wait with no time-based updaters on screen)
+    are written as a still segment instead of rasterizing-once-then-encoding every frame.
+    Animation frames are drawn into a FrameRing and handed to the encoder thread without a copy,
+    so rasterizing the next frame overlaps with encoding the previous ones.
+    With dry_run=True it runs every animation to its end state in one step, never touches the
+    camera or the encoder; manim's skipping already advances time by each play's duration, so the
+    timeline comes out exact.
+    """
+
+    def __init__(self, dry_run=False, **kwargs):
+        kwargs.setdefault("file_writer_class", CombinedSceneFileWriter)
+        kwargs.setdefault("camera_class", MovingCamera)
+        if dry_run:
+            kwargs["skip_animations"] = True
+        super().__init__(**kwargs)
+        self.dry_run = dry_run
+        self.frame_ring = None
+        self.overlay = None  # Still mobjects drawn above the animated ones: (rows, cols, premultiplied rgb, 255 - alpha)
+        self.overlay_layer = None  # Transparent buffer render_overlay draws into, reused across plays
+
+    def render(self, scene, time, moving_mobjects):
+        # Buffers are returned from encode_and_write_frame, which manim versions without it, and renders
+        # that write no movie (png output, write_to_movie=False), never call
+        if (self.skip_animations or not FRAME_RING_SIZE or not write_to_movie()
+                or not hasattr(SceneFileWriter, "encode_and_write_frame")):
+            return super().render(scene, time, moving_mobjects)
+        if self.frame_ring is None:
+            pixel_array = self.camera.pixel_array
+            self.frame_ring = FrameRing(pixel_array.shape, pixel_array.dtype, FRAME_RING_SIZE)
+        self.file_writer.frame_ring = self.frame_ring
+        self.update_frame(scene, moving_mobjects)
+        frame = self.camera.pixel_array
+        self.frame_ring.submit(frame)
+        # The buffer itself goes to the encoder; the next update_frame draws into another one
+        self.add_frame(frame)
+
+    def play(self, scene, *args, **kwargs):
+        try:
+            super().play(scene, *args, **kwargs)
+        finally:
+            self.overlay = None  # Only valid for the play it was built for
+
+    def get_frame(self):
+        if self.dry_run:
+            return self.camera.pixel_array  # Never read; avoids copying a blank frame per play
+        return super().get_frame()
+
+    def capture_frame(self, scene, path):
+        """Rasterizes the scene as it stands right now (even in a dry run) and saves it as a PNG."""
+        self.static_image = None  # Holds a blank frame in dry runs; draw everything from scratch
+        with profiler.phase("rasterize"):
+            super().update_frame(scene, ignore_skipping=True)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.camera.get_image().save(path)
+        print(f"Frame at {self.time:.2f}s -> {path}")
+
+    def freeze_current_frame(self, duration):
+        dt = 1 / self.camera.frame_rate
+        num_frames = int(duration / dt)
+        if (not STILL_HOLDS or self.skip_animations or not write_to_movie()
+                or config.movie_file_extension != ".mp4" or config.transparent
+                or num_frames < STILL_HOLD_MIN_FRAMES or not hasattr(self.file_writer, "write_still")):
+            return super().freeze_current_frame(duration)
+        with profiler.phase("encode_still"):
+            self.file_writer.write_still(self.get_frame(), num_frames)
+        profiler.count("frames_written", num_frames)
+        profiler.count("still_holds")
+        self.time += num_frames * dt
+
+    def save_static_frame_data(self, scene, static_mobjects):
+        # Below the animated mobjects: manim's static background image. Above them: the overlay layer
+        self.overlay = None
+        static_image = super().save_static_frame_data(scene, static_mobjects)
+        self.overlay = self.render_overlay(getattr(scene, "overlay_mobjects", []))
+        return static_image
+
+    def render_overlay(self, mobjects):
+        """Rasterizes mobjects once onto a transparent layer, cropped to the pixels they cover."""
+        if not mobjects:
+            return None
+        pixel_array = self.camera.pixel_array
+        # One layer for every play: Camera caches a Cairo context per id(pixel_array) and never evicts
+        layer = self.overlay_layer
+        if layer is None or layer.shape != pixel_array.shape:
+            layer = self.overlay_layer = np.zeros_like(pixel_array)
+        else:
+            layer.fill(0)
+        self.camera.pixel_array = layer
+        try:
+            with profiler.phase("rasterize"):
+                self.camera.capture_mobjects(mobjects)
+        finally:
+            self.camera.pixel_array = pixel_array
+        rows, cols = np.nonzero(layer[:, :, 3].any(axis=1))[0], np.nonzero(layer[:, :, 3].any(axis=0))[0]
+        if not len(rows):
+            return None
+        rows, cols = slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1)
+        crop = layer[rows, cols]
+        # Cairo leaves premultiplied colours, so compositing is rgb + base * (1 - alpha)
+        return rows, cols, crop[:, :, :3].astype(np.uint16), (255 - crop[:, :, 3:]).astype(np.uint16)
+
+    def update_frame(self, *args, **kwargs):
+        if self.dry_run:
+            return
+        if self.frame_ring is not None:
+            # Never draw into a buffer that is still queued for encoding; every update_frame redraws fully
+            self.camera.pixel_array = self.frame_ring.acquire()
+        profiler.count("frames_rasterized")
+        with profiler.phase("rasterize"):
+            result = super().update_frame(*args, **kwargs)
+        if self.overlay is not None:
+            rows, cols, rgb, inverse_alpha = self.overlay
+            with profiler.phase("composite_overlay"):
+                region = self.camera.pixel_array[rows, cols, :3]
+                region[...] = rgb + (region * inverse_alpha + 127) // 255
+        return result
+
+    def add_frame(self, frame, num_frames=1):
+        if self.skip_animations:
+            return super().add_frame(frame, num_frames)
+        profiler.count("frames_written", num_frames)
+        # With manim's writer thread this is only the hand-off; frame_ring_wait shows encoder back-pressure
+        with profiler.phase("encode"):
+            return super().add_frame(frame, num_frames)
+
+    def scene_finished(self, scene):
+        if self.dry_run:
+            return  # No partial movies to combine
+        # Concatenating partial movies and muxing the audio track
+        with profiler.phase("finalize_movie"):
+            return super().scene_finished(scene)
+
+
+# -----------------------------
+# SceneClock：每个场景的时间源
+# -----------------------------
+class SceneClock:
+    """
+    Per-scene time source read from the renderer's frame clock.
+    The renderer advances its time exactly once per written frame (frozen waits included),
+    so every updater sees the timestamp of the frame being drawn, in O(1) and without drift.
+    Updaters only read it; nothing but the renderer ever moves time forward.
+    """
+
+    def __init__(self, scene):
+        self.scene = scene
+        self.start = self.now()
+
+    def now(self):
+        """Time of the frame being rendered, counted from the start of the whole movie."""
+        return self.scene.renderer.time
+
+    def reset(self):
+        """Makes the next rendered frame t=0 of a new scene."""
+        self.start = self.now()
+
+    @property
+    def time(self):
+        """Seconds since the current scene started."""
+        return self.now() - self.start
+
+
+# -----------------------------
+# Starfield：向量化的星空背景
+# -----------------------------
+class Starfield(VGroup):
+    """
+    Twinkling star field: the same round Dots as one Dot per star with its own updater, in a single
+    group driven by a single updater. Base opacities, frequencies and phases live in NumPy arrays,
+    so each frame's opacities come from one vectorized expression.
+    """
+
+    def __init__(self, num_stars=200, radius=0.02, color=MY_WHITE, width=None, height=None,
+                 amplitude=0.4, min_opacity=0.1, max_opacity=0.9, **kwargs):
+        width = config.frame_width * 0.95 if width is None else width
+        height = config.frame_height * 0.95 if height is None else height
+        xs = np.random.uniform(-width / 2, width / 2, num_stars)
+        ys = np.random.uniform(-height / 2, height / 2, num_stars)
+        self.base_opacities = np.random.uniform(0.3, 0.7, num_stars)
+        self.frequencies = np.random.uniform(0.3, 0.8, num_stars)
+        self.phases = np.random.uniform(0, 2 * PI, num_stars)
+        self.amplitude = amplitude
+        self.min_opacity = min_opacity
+        self.max_opacity = max_opacity
+        super().__init__(*(Dot(point=[x, y, 0], radius=radius, color=color) for x, y in zip(xs, ys)), **kwargs)
+        self.twinkle(0)
+
+    def get_opacities(self, t):
+        """Opacity of every star at time t."""
+        variation = self.amplitude * np.sin(2 * PI * self.frequencies * t + self.phases)
+        return np.clip(self.base_opacities + variation, self.min_opacity, self.max_opacity)
+
+    def twinkle(self, t):
+        """Sets every star's opacity for time t."""
+        for star, opacity in zip(self.submobjects, self.get_opacities(t)):
+            # Dots have no stroke; writing the fill alpha skips set_opacity's per-star colour rebuild
+            star.fill_rgbas[:, 3] = opacity
+        return self
+
+
+# -----------------------------
+# HLSPublisher：边渲染边发布 HLS
+# -----------------------------
+class HLSPublisher:
+    """
+    Grows a live (EVENT) HLS playlist one scene at a time while the render continues.
+    Each scene's partial movies are stream-copied (no re-encode) into MPEG-TS segments together
+    with its slice of the narration track, on a single background thread so scenes go out in order.
+    Timestamps are offset to the scene's start, so segments play back-to-back without discontinuities.
+    Segments are cut at the first keyframe after segment_seconds, and the render keeps keyframes at
+    most keyframe_seconds apart, so the playlist's target duration is fixed up front (RFC 8216 does
+    not allow it to change while the playlist grows).
+    """
+
+    def __init__(self, output_dir, segment_seconds=HLS_SEGMENT_SECONDS, keyframe_seconds=HLS_KEYFRAME_SECONDS):
+        self.output_dir = output_dir
+        self.playlist_file = os.path.join(output_dir, "index.m3u8")
+        self.segment_seconds = segment_seconds
+        self.keyframe_seconds = keyframe_seconds
+        self.target_duration = int(np.ceil(segment_seconds + keyframe_seconds))
+        self.segments = []  # (filename, duration) in playback order
+        self.started = time.perf_counter()
+        self.first_segment_seconds = None  # Render start -> first segment in the playlist
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = []
+        os.makedirs(output_dir, exist_ok=True)
+        for name in os.listdir(output_dir):
+            if name.endswith((".ts", ".m3u8", ".txt")):
+                os.remove(os.path.join(output_dir, name))
+        self._write_playlist()
+
+    def publish(self, index, name, movie_files, audio_cues, start, end):
+        """Queues one finished scene; audio_cues are the file writer's narration cues so far."""
+        self._pending.append(self._executor.submit(self._publish, index, name, movie_files, audio_cues, start, end))
+
+    def _publish(self, index, name, movie_files, audio_cues, start, end):
+        prefix = os.path.join(self.output_dir, f"{index:02d}_{name}")
+        list_file, scene_playlist = f"{prefix}.txt", f"{prefix}.m3u8"
+        duration = end - start
+        with open(list_file, "w", encoding="utf-8") as f:
+            for movie_file in movie_files:
+                f.write(f"file '{os.path.abspath(movie_file)}'\n")
+        try:
+            # Narration cues are at absolute times, so a line running past its scene lands in the next window
+            audio_inputs, graph = audio_mix_args(audio_cues, start, duration, first_input=1)
+            with profiler.phase("hls_publish"):
+                run_ffmpeg("-f", "concat", "-safe", "0", "-i", list_file, *audio_inputs,
+                           "-filter_complex", graph, "-map", "0:v", "-map", "[a]", "-t", f"{duration:.6f}",
+                           "-c:v", "copy", "-c:a", "aac", "-output_ts_offset", f"{start:.6f}",
+                           "-f", "hls", "-hls_time", str(self.segment_seconds), "-hls_list_size", "0",
+                           "-hls_segment_filename", f"{prefix}_%03d.ts", scene_playlist)
+            segments = self._read_segments(scene_playlist)
+            for filename, segment_duration in segments:
+                if round(segment_duration) > self.target_duration:
+                    print(f"HLS: {filename} is {segment_duration:.2f}s, over the "
+                          f"{self.target_duration}s target duration (partial movie without keyframes?)")
+            self.segments += segments
+            self._write_playlist()
+        finally:
+            for path in (list_file, scene_playlist):
+                if os.path.exists(path):
+                    os.remove(path)
+        if self.first_segment_seconds is None:
+            self.first_segment_seconds = time.perf_counter() - self.started
+            print(f"HLS: first scene live after {self.first_segment_seconds:.1f}s -> {self.playlist_file}")
+        print(f"HLS: published {name} ({duration:.1f}s of video)")
+
+    @staticmethod
+    def _read_segments(playlist_file):
+        segments, duration = [], None
+        with open(playlist_file, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("#EXTINF:"):
+                    duration = float(line[len("#EXTINF:"):].split(",")[0])
+                elif line and not line.startswith("#"):
+                    segments.append((line, duration))
+        return segments
+
+    def _write_playlist(self, ended=False):
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+            f"#EXT-X-TARGETDURATION:{self.target_duration}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+        ]
+        for filename, duration in self.segments:
+            lines += [f"#EXTINF:{duration:.6f},", filename]
+        if ended:
+            lines.append("#EXT-X-ENDLIST")
+        # Players poll the playlist, so replace it atomically
+        tmp_file = f"{self.playlist_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_file, self.playlist_file)
+
+    def close(self):
+        """Waits for queued scenes, then ends the playlist. Returns a summary for the render profile."""
+        for future in self._pending:
+            future.result()
+        self._executor.shutdown()
+        self._write_playlist(ended=True)
+        return {
+            "playlist": self.playlist_file,
+            "segments": len(self.segments),
+            "first_segment_seconds": self.first_segment_seconds,
+        }
+
+
+class RenditionLadder:
+    """
+    Encodes every rung of an ABR ladder from the frames of a single render.
+    Full-resolution frames are piped to one ffmpeg process that splits, scales and encodes them into a
+    video-only movie per rung, all encoders running side by side, with keyframes forced at the same
+    times in every rung so segments line up for switching. finish() mixes the narration once and
+    packages each rung as an HLS VOD playlist (stream copy), plus a master playlist listing them all.
+    """
+
+    def __init__(self, output_dir, width, height, frame_rate, rungs=ABR_LADDER, segment_seconds=HLS_SEGMENT_SECONDS):
+        self.output_dir = output_dir
+        self.frame_rate = frame_rate
+        self.segment_seconds = segment_seconds
+        self.frames = 0
+        # (name, width, height, max bitrate); widths keep the aspect ratio and stay even for yuv420p
+        self.rungs = [(f"{h}p", int(round(width * h / height / 2)) * 2, h, bitrate)
+                      for h, bitrate in rungs if h <= height] or [(f"{height}p", width, height, rungs[0][1])]
+        if os.path.isdir(output_dir):
+            shutil.rmtree(output_dir)
+        for name, *_ in self.rungs:
+            os.makedirs(os.path.join(output_dir, name))
+
+        scales = [f"[s{i}]scale={w}:{h},format=yuv420p[v{i}]" for i, (_, w, h, _) in enumerate(self.rungs)]
+        args = [FFMPEG_BIN, "-y", "-loglevel", "error",
+                "-f", "rawvideo", "-pix_fmt", "rgba", "-s", f"{width}x{height}", "-r", str(frame_rate), "-i", "pipe:0",
+                "-filter_complex", f"[0:v]split={len(self.rungs)}{''.join(f'[s{i}]' for i in range(len(self.rungs)))};"
+                                   + ";".join(scales)]
+        for i, (name, _, _, bitrate) in enumerate(self.rungs):
+            # Level 4.0 covers every rung up to 1080p30, so the master playlist can state CODECS up front
+            args += ["-map", f"[v{i}]", "-c:v", "libx264", "-crf", "23", "-maxrate", bitrate,
+                     "-bufsize", f"{2 * int(bitrate.rstrip('k'))}k", "-profile:v", "high", "-level:v", "4.0",
+                     "-force_key_frames", f"expr:gte(t,n_forced*{segment_seconds})",
+                     os.path.join(output_dir, name, "video.mp4")]
+        self.process = subprocess.Popen(args, stdin=subprocess.PIPE)
+
+    def add_frame(self, frame, num_frames=1):
+        """Queues a full-resolution RGBA frame for every rung; blocks while the encoders are behind."""
+        with profiler.phase("ladder_encode"):
+            try:
+                for _ in range(num_frames):
+                    self.process.stdin.write(frame)
+            except BrokenPipeError:
+                raise RuntimeError(f"ABR ladder encoder exited with code {self.process.wait()}") from None
+        self.frames += num_frames
+
+    def finish(self, audio_cues, subtitles=None):
+        """
+        Finishes the rung movies, adds the narration and writes the playlists. Returns a summary.
+        subtitles (a SubtitleTrack) become a WebVTT rendition shared by every rung.
+        """
+        self.process.stdin.close()
+        if self.process.wait():
+            raise RuntimeError(f"ABR ladder encoder exited with code {self.process.returncode}")
+        duration = self.frames / self.frame_rate
+        audio_file = os.path.join(self.output_dir, "audio.m4a")
+        audio_inputs, graph = audio_mix_args(audio_cues, 0.0, duration, first_input=0)
+        with profiler.phase("ladder_package"):
+            # Mixed and encoded once, then stream-copied into every rung
+            run_ffmpeg(*audio_inputs, "-filter_complex", graph, "-map", "[a]",
+                       "-c:a", "aac", "-b:a", ABR_AUDIO_BITRATE, audio_file)
+            with ThreadPoolExecutor(max_workers=len(self.rungs)) as pool:
+                variants = list(pool.map(lambda rung: self._package(rung, audio_file), self.rungs))
+        os.remove(audio_file)
+
+        master_file = os.path.join(self.output_dir, "master.m3u8")
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-INDEPENDENT-SEGMENTS"]
+        subtitle_group = ""
+        if subtitles and subtitles.cues:
+            lines.append(f"#EXT-X-MEDIA:TYPE=SUBTITLES,GROUP-ID=\"subs\",NAME=\"{SUBTITLE_NAME}\",LANGUAGE=\"{SUBTITLE_LANGUAGE}\","
+                         f"DEFAULT=YES,AUTOSELECT=YES,URI=\"{self._write_subtitles(subtitles, duration)}\"")
+            subtitle_group = ",SUBTITLES=\"subs\""
+        for variant in variants:
+            lines += [f"#EXT-X-STREAM-INF:BANDWIDTH={variant['peak_bitrate']},AVERAGE-BANDWIDTH={variant['average_bitrate']},"
+                      f"RESOLUTION={variant['resolution']},FRAME-RATE={self.frame_rate:.3f},CODECS=\"avc1.640028,mp4a.40.2\""
+                      + subtitle_group, variant["playlist"]]
+        with open(master_file, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        print(f"ABR ladder: {', '.join(name for name, *_ in self.rungs)} -> {master_file}")
+        return {"master_playlist": master_file, "frames": self.frames, "renditions": variants}
+
+    def _write_subtitles(self, subtitles, duration):
+        """Writes the cues as one WebVTT segment with its playlist; returns the playlist's relative URI."""
+        subtitle_dir = os.path.join(self.output_dir, "subtitles")
+        os.makedirs(subtitle_dir, exist_ok=True)
+        # Cue times are video times; map 0 to the first video timestamp of the TS segments
+        with av.open(os.path.join(self.output_dir, self.rungs[0][0], "000.ts")) as container:
+            first_pts = container.streams.video[0].start_time or 0
+        with open(os.path.join(subtitle_dir, "000.vtt"), "w", encoding="utf-8") as f:
+            f.write(subtitles.to_webvtt(header=f"X-TIMESTAMP-MAP=MPEGTS:{first_pts},LOCAL:00:00:00.000"))
+        with open(os.path.join(subtitle_dir, "index.m3u8"), "w", encoding="utf-8") as f:
+            f.write("\n".join(["#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{int(np.ceil(duration))}",
+                               "#EXT-X-MEDIA-SEQUENCE:0", "#EXT-X-PLAYLIST-TYPE:VOD",
+                               f"#EXTINF:{duration:.6f},", "000.vtt", "#EXT-X-ENDLIST"]) + "\n")
+        return "subtitles/index.m3u8"
+
+    def _package(self, rung, audio_file):
+        name, width, height, _ = rung
+        rung_dir = os.path.join(self.output_dir, name)
+        video_file, playlist = os.path.join(rung_dir, "video.mp4"), os.path.join(rung_dir, "index.m3u8")
+        run_ffmpeg("-i", video_file, "-i", audio_file, "-map", "0:v", "-map", "1:a", "-c", "copy",
+                   "-f", "hls", "-hls_time", str(self.segment_seconds), "-hls_playlist_type", "vod",
+                   "-hls_segment_filename", os.path.join(rung_dir, "%03d.ts"), playlist)
+        os.remove(video_file)
+        # BANDWIDTH is the peak segment bitrate, measured on the segments as written
+        bitrates, total_bits, total_seconds = [], 0, 0.0
+        for filename, seconds in HLSPublisher._read_segments(playlist):
+            bits = os.path.getsize(os.path.join(rung_dir, filename)) * 8
+            bitrates.append(bits / seconds if seconds else 0)
+            total_bits, total_seconds = total_bits + bits, total_seconds + seconds
+        return {
+            "playlist": f"{name}/index.m3u8",
+            "resolution": f"{width}x{height}",
+            "segments": len(bitrates),
+            "peak_bitrate": int(max(bitrates, default=0)),
+            "average_bitrate": int(total_bits / total_seconds) if total_seconds else 0,
+        }
+
+
+# -----------------------------
+# CombinedScene：整合所有场景并添加字幕和音频
+# -----------------------------
+class CombinedScene(MovingCameraScene):
+    """
+    合并所有场景的 Manim 动画，用于讲解如何求解函数 f(x)=x^2 的切线方程。
+    """
+    # Scene methods in playback order; each one starts from a cleared frame with its own background
+    SCENES = ["play_scene_01", "play_scene_02", "play_scene_03", "play_scene_04", "play_scene_05", "play_outro"]
+    # Subset of SCENES to render; None renders all of them (set on the per-scene classes of a parallel render)
+    scene_methods = None
+
+    def __init__(self, renderer=None, dry_run=False, hls=False, ladder=False, soft_subtitles=False, frame_targets=None,
+                 **kwargs):
+        # (scene method, seconds into that scene or None for its last frame, PNG path); only these are rasterized
+        self.frame_targets = list(frame_targets or [])
+        self._frame_queue = []  # (video time, PNG path) still to capture in the current scene, in order
+        self._frames_captured = 0
+        self._play_start = 0.0  # renderer.time when the current play began
+        dry_run = dry_run or bool(self.frame_targets)
+        self.dry_run = dry_run
+        self.hls = hls and not dry_run  # Publish each finished scene as live HLS segments
+        self.hls_publisher = None
+        self.ladder = ladder and not dry_run  # Also encode the ABR ladder from the same frames
+        # Narration as a subtitle track instead of Text in the frame; dry runs and stills leave it out too
+        self.soft_subtitles = soft_subtitles
+        self.subtitle_track = None
+        self.out_of_frame = []  # Filled in dry runs: mobjects that end up outside the camera frame
+        if renderer is None and config.renderer == RendererType.CAIRO:
+            renderer = CombinedSceneRenderer(dry_run=dry_run, skip_animations=kwargs.get("skip_animations", False))
+        super().__init__(renderer=renderer, **kwargs)
+
+    def setup(self):
+        super().setup()
+        enable_glyph_cache()
+        # Download all narration up front so construct() only reads from the cache
+        prefetch_tts(collect_voiceover_texts(type(self)))
+
+    def tear_down(self):
+        super().tear_down()
+        if self.hls_publisher:
+            # Every scene is already encoded; end the playlist before the final movie is combined
+            self.hls_summary = self.hls_publisher.close()
+        file_writer = self.renderer.file_writer
+        if self.subtitle_track:
+            SubtitleTrack.active = None
+            vtt_file, file_writer.subtitle_file = self.subtitle_track.write(os.path.splitext(file_writer.movie_file_path)[0])
+            print(f"Subtitles: {len(self.subtitle_track.cues)} cues -> {vtt_file}")
+        if file_writer.ladder:
+            # The writer thread is joined at the end of every play, so every frame has been piped
+            self.ladder_summary = file_writer.ladder.finish(file_writer.audio_cues, self.subtitle_track)
+        print(f"TTS client stats: {get_tts_client().summary()}")
+
+    def render(self, preview=False):
+        profiler.reset()
+        result = super().render(preview)
+        if PROFILE_RENDER and not self.dry_run:
+            path = os.path.join(config.get_dir("media_dir"), f"{config.output_file or type(self).__name__}.profile.json")
+            report = profiler.write(path, scene=type(self).__name__, tts_client=get_tts_client().summary(),
+                                    video_seconds=self.renderer.time, hls=getattr(self, "hls_summary", None),
+                                    ladder=getattr(self, "ladder_summary", None))
+            print(f"Render profile: {report['wall_seconds']:.1f}s wall, "
+                  f"{report['counters'].get('frames_written', 0)} frames -> {path}")
+        return result
+
+    def construct(self):
+        # Scene-local time for updaters, restarted at the beginning of every scene
+        self.clock = SceneClock(self)
+        if self.hls and write_to_movie():
+            self.hls_publisher = HLSPublisher(os.path.join(config.get_dir("media_dir"), "hls",
+                                                           config.output_file or type(self).__name__))
+            self.renderer.file_writer.keyframe_seconds = self.hls_publisher.keyframe_seconds
+            self._hls_published = (0, 0.0)  # (partial movies, video seconds) already handed to the publisher
+        if self.soft_subtitles and not self.dry_run and write_to_movie():
+            self.subtitle_track = SubtitleTrack(clock=lambda: self.renderer.time)
+            SubtitleTrack.active = self.subtitle_track
+        if self.ladder and write_to_movie():
+            if not hasattr(SceneFileWriter, "encode_and_write_frame"):
+                raise RuntimeError("ABR ladder output needs manim's writer thread (manim >= 0.18)")
+            self.renderer.file_writer.ladder = RenditionLadder(
+                os.path.join(config.get_dir("media_dir"), "ladder", config.output_file or type(self).__name__),
+                config.pixel_width, config.pixel_height, config.frame_rate)
+
+        # --- Play Scenes Sequentially ---
+        for index, name in enumerate(self.scene_methods or self.SCENES):
+            self.clock.reset()
+            if self.frame_targets:
+                self._frame_queue = sorted((self.renderer.time + t, path)
+                                           for scene, t, path in self.frame_targets if scene == name and t is not None)
+            self._profile_step(name, getattr(self, name))
+            if self.frame_targets:
+                self._capture_scene_end(name)
+            if name != "play_outro":
+                self._profile_step(f"{name}:clear_and_reset", self.clear_and_reset, phase="transition")
+            if self.hls_publisher:
+                self.publish_scene(index, name)
+
+    def compile_animation_data(self, *args, **kwargs):
+        self.overlay_mobjects = []  # Static waits skip get_moving_and_static_mobjects
+        return super().compile_animation_data(*args, **kwargs)
+
+    def get_moving_and_static_mobjects(self, animations):
+        """
+        manim treats every mobject after the first animated one (in self.mobjects order) as moving and
+        redraws it on every frame. Here the split follows the draw order instead: still mobjects below
+        the lowest animated one become the static background image, still vector mobjects above the
+        highest one become an overlay rasterized once per play, and only the span in between is redrawn.
+        """
+        moving, static = super().get_moving_and_static_mobjects(animations)
+        self.overlay_mobjects = []
+        if not STATIC_LAYERS or self.renderer.skip_animations:
+            return moving, static
+        animated = [animation.mobject for animation in animations]
+        if any(self.camera.frame in mob.get_family() for mob in animated) or self.camera.frame.get_updaters():
+            return moving, static  # The camera moves, so every pixel changes
+
+        scene_mobjects = list_update(self.mobjects, self.foreground_mobjects)
+        use_z_index = self.renderer.camera.use_z_index
+        draw_order = extract_mobject_family_members(scene_mobjects, use_z_index=use_z_index, only_those_with_points=True)
+        changing = {id(mob) for mob in extract_mobject_family_members(
+            animated + [mob for mob in scene_mobjects if mob.get_family_updaters() or mob in self.foreground_mobjects])}
+        indices = [i for i, mob in enumerate(draw_order) if id(mob) in changing]
+        if not indices:
+            return moving, static
+        first, last = indices[0], indices[-1] + 1
+        below, middle, above = draw_order[:first], draw_order[first:last], draw_order[last:]
+        if not all(isinstance(mob, VMobject) for mob in above):
+            # Only Cairo-drawn vectors give a correctly premultiplied transparent layer
+            middle, above = middle + above, []
+        self.overlay_mobjects = above
+        return middle, below
+
+    def _capture_scene_end(self, name):
+        if self._frame_queue:
+            raise ValueError(f"{name} is only {self.clock.time:.2f}s long; "
+                             f"cannot render {', '.join(path for _, path in self._frame_queue)}")
+        for scene, t, path in self.frame_targets:
+            if scene == name and t is None:
+                self.capture_frame(path)
+
+    def capture_frame(self, path):
+        """Writes the current frame and ends the render once every requested frame exists."""
+        self.renderer.capture_frame(self, path)
+        self._frames_captured += 1
+        if self._frames_captured == len(self.frame_targets):
+            raise EndSceneEarlyException()  # Nothing after this frame needs to run
+
+    def get_time_progression(self, run_time, *args, **kwargs):
+        times = super().get_time_progression(run_time, *args, **kwargs)
+        # Skipping, manim has already moved renderer.time to the end of this play
+        start = self._play_start
+        if self._frame_queue and self._frame_queue[0][0] < start + run_time:
+            return self._capturing_progression(times, start, run_time, self.renderer.time)
+        return times
+
+    def _capturing_progression(self, times, start, run_time, clock):
+        """Stops at every queued frame that falls inside this animation, then finishes it as usual."""
+        while self._frame_queue and self._frame_queue[0][0] < start + run_time:
+            target, path = self._frame_queue.pop(0)
+            self.renderer.time = target  # Time-based updaters read the scene clock
+            yield target - start
+            self.capture_frame(path)
+        self.renderer.time = clock
+        yield from times
+
+    def publish_scene(self, index, name):
+        """Hands everything rendered since the last scene boundary to the HLS publisher."""
+        file_writer = self.renderer.file_writer
+        parts_done, start = self._hls_published
+        end = self.renderer.time
+        movie_files = [f for f in file_writer.partial_movie_files[parts_done:] if f is not None]
+        self._hls_published = (len(file_writer.partial_movie_files), end)
+        if movie_files:
+            self.hls_publisher.publish(index, name, movie_files, list(file_writer.audio_cues), start, end)
+
+    def _profile_step(self, name, method, phase=None):
+        """Runs one scene method and records its wall time, video time span and play/wait share."""
+        self._current_step = name
+        calls_before = len(profiler.calls)
+        video_start = self.renderer.time
+        start = time.perf_counter()
+        with profiler.phase(phase) if phase else contextlib.nullcontext():
+            method()
+        wall = time.perf_counter() - start
+        play_wall = sum(call["wall_seconds"] for call in profiler.calls[calls_before:])
+        # Whatever is not spent inside play/wait is building mobjects, layout and TTS lookups
+        profiler.add_scene(name=name, wall_seconds=wall, play_wall_seconds=play_wall,
+                           construction_seconds=wall - play_wall,
+                           video_start=video_start, video_end=self.renderer.time)
+        if not phase:
+            profiler.add_time("mobject_construction", wall - play_wall)
+
+    def play(self, *args, **kwargs):
+        is_wait = len(args) == 1 and isinstance(args[0], Wait)
+        video_start = self._play_start = self.renderer.time
+        start = time.perf_counter()
+        super().play(*args, **kwargs)
+        profiler.add_call(
+            scene=getattr(self, "_current_step", None),
+            kind="wait" if is_wait else "play",
+            animations=[type(anim).__name__ for anim in args],
+            wall_seconds=time.perf_counter() - start,
+            video_start=video_start,
+            video_seconds=self.renderer.time - video_start,
+        )
+        if self.dry_run:
+            self.check_layout()
+        # Frames inside a frozen wait, or exactly at the end of an animation, show its end state
+        while self._frame_queue and self._frame_queue[0][0] <= self.renderer.time:
+            self.capture_frame(self._frame_queue.pop(0)[1])
+
+    def check_layout(self, tolerance=0.05):
+        """Records every on-screen mobject whose bounding box leaves the camera frame."""
+        frame = self.camera.frame
+        center = frame.get_center()
+        half_w, half_h = frame.width / 2 + tolerance, frame.height / 2 + tolerance
+        seen = {entry["id"] for entry in self.out_of_frame}
+        for mob in self.mobjects:
+            if id(mob) in seen:
+                continue
+            left, right = mob.get_left()[0] - center[0], mob.get_right()[0] - center[0]
+            bottom, top = mob.get_bottom()[1] - center[1], mob.get_top()[1] - center[1]
+            overflow = {
+                "left": max(0.0, -half_w - left),
+                "right": max(0.0, right - half_w),
+                "bottom": max(0.0, -half_h - bottom),
+                "top": max(0.0, top - half_h),
+            }
+            if any(overflow.values()):
+                self.out_of_frame.append({
+                    "id": id(mob),
+                    "scene": getattr(self, "_current_step", None),
+                    "time": self.renderer.time,
+                    "mobject": type(mob).__name__,
+                    "text": getattr(mob, "text", None) or getattr(mob, "tex_string", None),
+                    "overflow": {side: round(value, 3) for side, value in overflow.items() if value},
+                })
+
+    def play_outro(self):
+        """结束画面"""
         # End of animation message
         final_message = Text("动画结束，感谢观看！ 😄", font_size=48, color=MY_WHITE)
         bg_final = Rectangle(width=config.frame_width, height=config.frame_height, fill_color=MY_BLACK, fill_opacity=1,
@@ -132,6 +1757,12 @@ class CombinedScene(MovingCameraScene):
         self.play(FadeIn(final_message))
         self.wait(2)
 
+    def subtitle_text(self, text, **kwargs):
+        """旁白字幕：软字幕模式下返回空对象（字幕改由字幕轨道显示），动画时间线不变"""
+        if self.soft_subtitles:
+            return VMobject()
+        return Text(text, **kwargs)
+
     def get_scene_number(self, number_str):
         """创建并定位场景编号"""
         scene_num = Text(number_str, font_size=24, color=MY_WHITE)
@@ -151,7 +1782,22 @@ class CombinedScene(MovingCameraScene):
         valid_mobjects = [m for m in self.mobjects if m is not None]
         all_mobjects = Group(*valid_mobjects)
 
-        if all_mobjects:
+        if all_mobjects and SNAPSHOT_TRANSITIONS and not self.renderer.skip_animations:
+            # Rasterize the last frame once and fade that bitmap: each transition frame is one
+            # image composite instead of a vector redraw of the background, stars, text and formulas
+            snapshot = self.snapshot_frame()
+            self.clear()
+            self.add(snapshot)
+            start = snapshot.get_center()
+
+            def fade_out(mob, alpha):
+                # Same motion as FadeOut(shift=DOWN * 0.5), but only the alpha channel changes;
+                # FadeOut would interpolate the full RGBA pixel array on every frame
+                mob.move_to(start + DOWN * 0.5 * alpha)
+                mob.set_opacity(1 - alpha)
+
+            self.play(UpdateFromAlphaFunc(snapshot, fade_out), run_time=0.5)
+        elif all_mobjects:
             # Fade out existing objects
             self.play(FadeOut(all_mobjects, shift=DOWN * 0.5), run_time=0.5)
 
@@ -166,34 +1812,28 @@ class CombinedScene(MovingCameraScene):
         # For MovingCameraScene, resetting scale and position is usually enough.
         # If explicit rotation was done: self.camera.frame.set(rotation=0) - check API if needed
 
-        # Reset the custom time tracker
-        self.scene_time_tracker.set_value(0)
         self.wait(0.1)  # Short pause after reset
 
-    def star_updater(self, star, dt):
-        """更新星星透明度，实现闪烁效果 (Uses scene_time_tracker)"""
-        # Retrieve stored parameters or use defaults
-        base_opacity = getattr(star, "base_opacity", 0.5)
-        frequency = getattr(star, "frequency", 0.5)
-        phase = getattr(star, "phase", 0)
-
-        current_time = self.scene_time_tracker.get_value()
-        # Calculate opacity based on sine wave
-        opacity_variation = 0.4 * np.sin(2 * PI * frequency * current_time + phase)
-        target_opacity = np.clip(base_opacity + opacity_variation, 0.1, 0.9)  # Clamp opacity
-
-        # Apply the calculated opacity
-        # Use set_opacity which handles both fill and stroke
-        star.set_opacity(target_opacity)
-
-        # Manually update the scene time tracker
-        self.scene_time_tracker.increment_value(dt)
+    def snapshot_frame(self):
+        """将当前画面栅格化一次，返回铺满相机画面的 ImageMobject"""
+        self.renderer.update_frame(self)
+        snapshot = ImageMobject(self.renderer.get_frame())
+        # 1:1 with the output pixels, so nearest neighbour is exact and the cheapest to composite
+        snapshot.set_resampling_algorithm(RESAMPLING_ALGORITHMS["nearest"])
+        frame = self.camera.frame
+        snapshot.stretch_to_fit_width(frame.width)
+        snapshot.stretch_to_fit_height(frame.height)
+        return snapshot.move_to(frame.get_center())
+
+    def star_updater(self, stars, dt):
+        """更新星空透明度，实现闪烁效果（只读取场景时钟，是时间的纯函数）"""
+        # dt is unused, but keeping it marks the updater as time-based so waits keep animating
+        # One vectorized sine/clip over all stars instead of a set_opacity call per Dot
+        stars.twinkle(self.clock.time)
 
     # --- Scene 1: Welcome & Starry Background ---
     def play_scene_01(self):
         """场景一：欢迎介绍与星空背景"""
-        self.scene_time_tracker.set_value(0)  # Reset time for this scene
-
         # Background
         bg1 = Rectangle(
             width=config.frame_width,
@@ -206,21 +1846,9 @@ class CombinedScene(MovingCameraScene):
         self.add(bg1)
 
         # Stars
-        stars = VGroup()
-        num_stars = 200
-        for _ in range(num_stars):
-            x_pos = np.random.uniform(-config.frame_width / 2 * 0.95, config.frame_width / 2 * 0.95)
-            y_pos = np.random.uniform(-config.frame_height / 2 * 0.95, config.frame_height / 2 * 0.95)
-            star_dot = Dot(point=[x_pos, y_pos, 0], radius=0.02, color=MY_WHITE)
-            # Store custom data directly on the mobject
-            star_dot.base_opacity = np.random.uniform(0.3, 0.7)
-            star_dot.frequency = np.random.uniform(0.3, 0.8)
-            star_dot.phase = np.random.uniform(0, 2 * PI)
-            # Set initial opacity using the method, not constructor
-            star_dot.set_opacity(star_dot.base_opacity)
-            stars.add(star_dot)
-
-        # Add the updater to the stars group
+        stars = Starfield(num_stars=200, radius=0.02, color=MY_WHITE)
+
+        # Add the updater to the star field
         stars.add_updater(self.star_updater)
         self.add(stars)
 
@@ -249,7 +1877,7 @@ class CombinedScene(MovingCameraScene):
                 # If TTS fails, we'll just run the animations without sound sync
 
             # Subtitle for the voiceover
-            subtitle_voice = Text(
+            subtitle_voice = self.subtitle_text(
                 voice_text_01,
                 font_size=32,
                 color=MY_WHITE,
@@ -308,8 +1936,6 @@ class CombinedScene(MovingCameraScene):
     # --- Scene 2: Tangent Concept & Problem Background ---
     def play_scene_02(self):
         """场景二：切线概念与问题背景介绍"""
-        self.scene_time_tracker.set_value(0)  # Reset time
-
         # Background
         bg2 = Rectangle(
             width=config.frame_width, height=config.frame_height,
@@ -387,7 +2013,7 @@ class CombinedScene(MovingCameraScene):
             else:
                 print("Warning: Scene 2 TTS audio failed or has zero duration.")
 
-            subtitle_voice_02 = Text(
+            subtitle_voice_02 = self.subtitle_text(
                 voice_text_02, font_size=32, color=MY_BLACK,
                 width=config.frame_width - 2, should_center=True
             ).to_edge(DOWN, buff=0.5)
@@ -439,8 +2065,6 @@ class CombinedScene(MovingCameraScene):
     # --- Scene 3: Solving Steps ---
     def play_scene_03(self):
         """场景三：切线求解步骤展示"""
-        self.scene_time_tracker.set_value(0)
-
         # Background (Light gray, maybe with faint grid)
         bg3 = Rectangle(
             width=config.frame_width, height=config.frame_height,
@@ -528,7 +2152,7 @@ class CombinedScene(MovingCameraScene):
             else:
                 print("Warning: Scene 3 TTS audio failed or has zero duration.")
 
-            subtitle_voice_03 = Text(
+            subtitle_voice_03 = self.subtitle_text(
                 voice_text_03, font_size=32, color=MY_BLACK,
                 width=config.frame_width - 2, should_center=True
             ).to_edge(DOWN, buff=0.5)
@@ -570,8 +2194,6 @@ class CombinedScene(MovingCameraScene):
     # --- Scene 4: Theoretical Principles ---
     def play_scene_04(self):
         """场景四：理论原理与数学公式解析"""
-        self.scene_time_tracker.set_value(0)
-
         # Background (Medium Gray)
         bg4 = Rectangle(
             width=config.frame_width, height=config.frame_height,
@@ -624,7 +2246,7 @@ class CombinedScene(MovingCameraScene):
             else:
                 print("Warning: Scene 4 TTS audio failed or has zero duration.")
 
-            subtitle_voice_04 = Text(
+            subtitle_voice_04 = self.subtitle_text(
                 voice_text_04, font_size=32, color=MY_BLACK,
                 width=config.frame_width - 2, should_center=True
             ).to_edge(DOWN, buff=0.5)
@@ -665,8 +2287,6 @@ class CombinedScene(MovingCameraScene):
     # --- Scene 5: Summary & Review ---
     def play_scene_05(self):
         """场景五：总结与回顾"""
-        self.scene_time_tracker.set_value(0)
-
         # Background (Dark Blue or Black)
         bg5 = Rectangle(
             width=config.frame_width, height=config.frame_height,
@@ -711,7 +2331,7 @@ class CombinedScene(MovingCameraScene):
             else:
                 print("Warning: Scene 5 TTS audio failed or has zero duration.")
 
-            subtitle_voice_05 = Text(
+            subtitle_voice_05 = self.subtitle_text(
                 voice_text_05, font_size=32, color=MY_WHITE,
                 width=config.frame_width - 2, should_center=True
             ).to_edge(DOWN, buff=0.5)  # Place above the final question maybe?
@@ -750,8 +2370,266 @@ class CombinedScene(MovingCameraScene):
         self.wait(2)  # Hold the final summary screen
 
 
+# -----------------------------
+# Dry run: construct() without any frames
+# -----------------------------
+def dry_run_timeline(scene_cls=None, output_path=None):
+    """
+    Runs scene_cls.construct in full (mobjects, play/wait, TTS lookups) with no rasterization
+    or encoding and returns its timeline: per-scene start/end, every play/wait with its duration,
+    the total video length and any mobjects that end up outside the frame.
+    Also writes it as JSON to output_path (default <media_dir>/<output_file>.timeline.json).
+    """
+    scene_cls = scene_cls or CombinedScene
+    scene = scene_cls(dry_run=True)
+    scene.render()
+
+    report = profiler.report()
+    timeline = {
+        "scene": scene_cls.__name__,
+        "total_seconds": scene.renderer.time,
+        "wall_seconds": report["wall_seconds"],
+        "scenes": [
+            {"name": entry["name"], "start": entry["video_start"], "end": entry["video_end"]}
+            for entry in report["scenes"]
+        ],
+        "animations": [
+            {"scene": call["scene"], "kind": call["kind"], "animations": call["animations"],
+             "start": call["video_start"], "duration": call["video_seconds"]}
+            for call in report["calls"]
+        ],
+        "out_of_frame": [{k: v for k, v in entry.items() if k != "id"} for entry in scene.out_of_frame],
+    }
+    output_path = output_path or os.path.join(config.get_dir("media_dir"),
+                                              f"{config.output_file or scene_cls.__name__}.timeline.json")
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(timeline, f, ensure_ascii=False, indent=2)
+    print(f"Dry run: {timeline['total_seconds']:.2f}s of video in {timeline['wall_seconds']:.1f}s, "
+          f"{len(timeline['out_of_frame'])} mobject(s) outside the frame -> {output_path}")
+    return timeline
+
+
+def render_frames(targets, scene_cls=None):
+    """
+    Renders only the requested frames, e.g. [("play_scene_03", 7.5, "cover.png"), ("play_scene_05", None, "end.png")]:
+    each target is (scene method, seconds into that scene or None for its last frame, PNG path).
+    construct() is fast-forwarded as in a dry run, only the target frames are rasterized,
+    and the render stops right after the last one. Returns the PNG paths.
+    """
+    scene_cls = scene_cls or CombinedScene
+    unknown = sorted({scene for scene, _, _ in targets} - set(scene_cls.SCENES))
+    if unknown:
+        raise ValueError(f"Unknown scene(s) {', '.join(unknown)}; expected one of {', '.join(scene_cls.SCENES)}")
+    scene_cls(frame_targets=targets).render()
+    return [path for _, _, path in targets]
+
+
+# -----------------------------
+# Parallel rendering: one process per scene, then concat
+# -----------------------------
+RENDER_CONFIG_KEYS = ["pixel_height", "pixel_width", "frame_rate", "output_file", "disable_caching", "media_dir"]
+
+
+def run_ffmpeg(*args):
+    """Runs ffmpeg quietly, raising CalledProcessError on failure."""
+    subprocess.run([FFMPEG_BIN, "-y", "-loglevel", "error", *args], check=True)
+
+
+def _render_scene_part(scene_cls, index, name, render_config):
+    """Process-pool worker: renders one scene method as its own movie and returns its path."""
+    for key, value in render_config.items():
+        config[key] = value
+    config.output_file = f"{render_config['output_file']}_part{index:02d}"
+    # A distinct class name gives every part its own partial_movie_files directory
+    part_cls = type(f"{scene_cls.__name__}Part{index:02d}", (scene_cls,), {"scene_methods": [name]})
+    scene = part_cls()
+    scene.render()
+    return str(scene.renderer.file_writer.movie_file_path)
+
+
+def scene_fingerprint(scene_cls, name, render_config):
+    """
+    Content hash of everything one scene's movie depends on: its method's source, the rest of the
+    script (shared helpers, colours, settings) minus the other scene methods, the bytes of its
+    narration audio, the render settings and the manim version.
+    Returns None if some narration is not cached, since the scene would render without it.
+    """
+    digest = hashlib.sha256()
+    method = getattr(scene_cls, name)
+    digest.update(inspect.getsource(method).encode('utf-8'))
+    other_methods = [inspect.getsource(getattr(scene_cls, other)) for other in scene_cls.SCENES if other != name]
+    modules = {inspect.getmodule(cls) for cls in scene_cls.__mro__}
+    for module in sorted((m for m in modules if m and not m.__name__.startswith(("manim", "builtins"))),
+                         key=lambda m: m.__name__):
+        source = inspect.getsource(module)
+        for other in other_methods:
+            source = source.replace(other, "")  # Editing another scene must not invalidate this one
+        digest.update(source.encode('utf-8'))
+    for text in collect_voiceover_texts(method):
+        cache_file = get_cache_filename(text)
+        if not os.path.exists(cache_file):
+            return None
+        with open(cache_file, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    settings = {key: value for key, value in render_config.items() if key not in ("output_file", "media_dir")}
+    settings["manim"] = manim_version
+    digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def store_scene_part(part_file, cache_file):
+    """Copies a freshly rendered scene movie into the scene cache (atomically, for concurrent jobs)."""
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    tmp_file = f"{cache_file}.tmp"
+    shutil.copyfile(part_file, tmp_file)
+    os.replace(tmp_file, cache_file)
+
+
+def concat_scene_parts(part_files, output_file):
+    """
+    Joins per-scene movies into output_file.
+    Video is stream-copied through the concat demuxer. Each part's audio is padded
+    (or synthesized as silence) to its video length and joined with the concat filter,
+    so narration never drifts even when a scene has no audio or ends in a silent hold.
+    """
+    list_file = f"{output_file}.parts.txt"
+    with open(list_file, "w", encoding="utf-8") as f:
+        for part in part_files:
+            f.write(f"file '{os.path.abspath(part)}'\n")
+
+    inputs = ["-f", "concat", "-safe", "0", "-i", list_file]
+    filters = []
+    audio_inputs = 0
+    for i, part in enumerate(part_files):
+        duration, has_audio = probe_movie(part)  # Not the header: it can leave out a part's closing hold
+        if has_audio:
+            inputs += ["-i", part]
+            audio_inputs += 1  # Input 0 is the concat list
+            filters.append(f"[{audio_inputs}:a]apad=whole_dur={duration},atrim=0:{duration}[a{i}]")
+        else:
+            filters.append(f"anullsrc=r=48000:cl=stereo,atrim=0:{duration}[a{i}]")
+    filters.append("".join(f"[a{i}]" for i in range(len(part_files))) + f"concat=n={len(part_files)}:v=0:a=1[a]")
+
+    try:
+        run_ffmpeg(*inputs, "-filter_complex", ";".join(filters),
+                   "-map", "0:v", "-map", "[a]", "-c:v", "copy", "-c:a", "aac", "-movflags", "+faststart",
+                   output_file)
+    finally:
+        os.remove(list_file)
+    return output_file
+
+
+def plan_scene_parts(scene_cls, render_config, use_scene_cache=True):
+    """
+    Looks every entry of scene_cls.SCENES up in the scene cache. Returns (cache_dir, cache_files, part_files):
+    where each fingerprinted scene's movie is (or will be) cached, and the cached movie of every scene
+    that can be reused as is. Narration must already be in the TTS cache.
+    """
+    cache_dir = SCENE_CACHE_DIR or os.path.join(config.get_dir("media_dir"), "scene_cache")
+    cache_files, part_files = {}, {}
+    if use_scene_cache:
+        for name in scene_cls.SCENES:
+            fingerprint = scene_fingerprint(scene_cls, name, render_config)
+            if fingerprint:
+                cache_files[name] = os.path.join(cache_dir, f"{fingerprint}.mp4")
+                if os.path.exists(cache_files[name]):
+                    touch_cache_file(cache_files[name])
+                    part_files[name] = cache_files[name]
+    return cache_dir, cache_files, part_files
+
+
+def evict_scene_cache(cache_dir):
+    """Trims the scene cache to SCENE_CACHE_MAX_BYTES, least recently used movies first."""
+    removed, total = evict_lru(cache_dir, SCENE_CACHE_MAX_BYTES, TTS_CACHE_MIN_AGE,
+                               is_entry=lambda file_name: file_name.endswith(".mp4"))
+    if removed:
+        print(f"Evicted {len(removed)} cached scene(s), scene cache now {total / 1024 / 1024:.1f} MB.")
+
+
+def parallel_output_file(render_config):
+    """Path of the stitched movie: where the part workers write their movies too."""
+    # The part workers run without an input_file, so no module_name
+    output_dir = config.get_dir("video_dir", module_name="")
+    os.makedirs(output_dir, exist_ok=True)
+    return os.path.join(output_dir, f"{render_config['output_file']}.mp4")
+
+
+def render_scenes_parallel(scene_cls=None, max_workers=None, use_scene_cache=True):
+    """
+    Renders every entry of scene_cls.SCENES as an independent sub-scene in a process pool,
+    then stitches them into the usual config.output_file movie. Returns the output path.
+    With use_scene_cache, scenes whose fingerprint is unchanged since an earlier render reuse
+    that render's movie as is and only the edited scenes are rendered.
+    """
+    scene_cls = scene_cls or CombinedScene
+    # Fetch narration once here instead of racing for it in every worker
+    prefetch_tts(collect_voiceover_texts(scene_cls))
+
+    render_config = {key: config[key] for key in RENDER_CONFIG_KEYS}
+    names = scene_cls.SCENES
+    cache_dir, cache_files, part_files = plan_scene_parts(scene_cls, render_config, use_scene_cache)
+    pending = [(i, name) for i, name in enumerate(names, start=1) if name not in part_files]
+
+    if pending:
+        max_workers = max_workers or min(len(pending), os.cpu_count() or 1)
+        print(f"Rendering {len(pending)} of {len(names)} scenes with {max_workers} worker(s)"
+              f"{f', reusing {len(part_files)} unchanged' if part_files else ''}...")
+        # spawn: a clean interpreter per worker instead of a forked copy of Cairo/Pango state
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {name: pool.submit(_render_scene_part, scene_cls, i, name, render_config) for i, name in pending}
+            for name, future in futures.items():
+                part_files[name] = future.result()
+                if name in cache_files:
+                    store_scene_part(part_files[name], cache_files[name])
+        if cache_files:
+            evict_scene_cache(cache_dir)
+    else:
+        print(f"All {len(names)} scenes unchanged, reusing cached movies...")
+    part_files = [part_files[name] for name in names]
+
+    output_file = parallel_output_file(render_config)
+    concat_scene_parts(part_files, output_file)
+    print(f"Concatenated {len(part_files)} scene parts into {output_file}")
+    return output_file
+
+
 # --- Main execution block ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render CombinedScene")
+    parser.add_argument("--parallel", type=int, nargs="?", const=0, default=None, metavar="WORKERS",
+                        help="render each scene in its own process and concat the results "
+                             "(WORKERS defaults to one per scene, capped at the CPU count); "
+                             "scenes unchanged since an earlier --parallel render are reused")
+    parser.add_argument("--no-scene-cache", action="store_true",
+                        help="with --parallel: re-render every scene instead of reusing unchanged ones")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="run construct() without rendering any frames and write the timeline JSON")
+    parser.add_argument("--frame", action="append", default=[], metavar="SCENE[@SECONDS]",
+                        help="only render this frame to <media_dir>/images as a PNG, e.g. play_scene_03@7.5 "
+                             "(without @SECONDS: the last frame of the scene); may be repeated")
+    parser.add_argument("--hls", action="store_true",
+                        help="also publish every finished scene to a live HLS playlist under <media_dir>/hls")
+    parser.add_argument("--ladder", action="store_true",
+                        help="also encode 1080p/720p/480p renditions from the same frames, packaged as HLS "
+                             "with a master playlist under <media_dir>/ladder")
+    parser.add_argument("--soft-subtitles", action="store_true",
+                        help="write the narration as .vtt/.srt next to the movie (and as its subtitle track) "
+                             "instead of drawing it into the frames")
+    parser.add_argument("--draft", action="store_true",
+                        help=f"validation render at {DRAFT_PIXEL_HEIGHT}p{DRAFT_FRAME_RATE} into CombinedScene_draft; "
+                             "a later full render reuses its TTS audio, durations and Text/MathTex SVGs")
+    args = parser.parse_args()
+    if args.hls and (args.parallel is not None or args.dry_run):
+        parser.error("--hls publishes scenes as a sequential render finishes them; "
+                     "it cannot be combined with --parallel or --dry-run")
+    if args.ladder and (args.parallel is not None or args.dry_run or args.frame):
+        parser.error("--ladder encodes the frames of a sequential render; "
+                     "it cannot be combined with --parallel, --dry-run or --frame")
+    if args.soft_subtitles and args.parallel is not None:
+        parser.error("--soft-subtitles records cues on a sequential render's timeline; "
+                     "it cannot be combined with --parallel")
+
     # Basic configuration
     config.pixel_height = 1080  # Set resolution height
     config.pixel_width = 1920  # Set resolution width
@@ -762,8 +2640,29 @@ if __name__ == "__main__":
     # Set output directory using placeholder for Java replacement
     config.media_dir = r"07"  # IMPORTANT: Use the placeholder
 
-    # Create and render the scene
-    scene = CombinedScene()
-    scene.render()
+    if args.draft:
+        # Same media_dir and TTS cache as the full render, so everything content-addressed carries over;
+        # partial movies land in their own <height>p<fps> directory and never mix with the full render
+        config.pixel_height = DRAFT_PIXEL_HEIGHT
+        config.pixel_width = DRAFT_PIXEL_WIDTH
+        config.frame_rate = DRAFT_FRAME_RATE
+        config.output_file = "CombinedScene_draft"
+
+    if args.frame:
+        targets = []
+        for spec in args.frame:
+            name, _, seconds = spec.partition("@")
+            label = seconds.replace(".", "_") if seconds else "end"
+            targets.append((name, float(seconds) if seconds else None,
+                            os.path.join(config.get_dir("media_dir"), "images", f"{config.output_file}_{name}_{label}.png")))
+        render_frames(targets)
+    elif args.dry_run:
+        dry_run_timeline()
+    elif args.parallel is not None:
+        render_scenes_parallel(max_workers=args.parallel, use_scene_cache=not args.no_scene_cache)
+    else:
+        # Create and render the scene
+        scene = CombinedScene(hls=args.hls, ladder=args.ladder, soft_subtitles=args.soft_subtitles)
+        scene.render()
 
     print(f"Scene rendering finished. Output in: {config.media_dir}")
\ No newline at end of file
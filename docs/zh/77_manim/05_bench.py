@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Render benchmarks for 05.py, one per workload that CombinedScene mixes:
+
+    starfield   200-star twinkling field on a background (play_scene_01)
+    axes_plot   Axes, plotted parabola and a moving tangent line (play_scene_02 / 03)
+    mathtex     dense list of MathTex derivation steps (play_scene_03 / 05)
+    camera      camera frame zooms and pans over a static layout (play_scene_05)
+    transition  clear_and_reset between filled scenes
+
+    python 05_bench.py
+    python 05_bench.py --only starfield camera --resolutions 720p30 --output bench.json
+    python 05_bench.py --compare bench_before.json
+
+Every benchmark renders through CombinedSceneRenderer in its own process (so peak RSS and warm
+caches never leak between them), at fixed resolutions, and reports frames/sec, peak RSS and the
+render profile's time per phase. Runs offline: no narration is fetched; benchmarks that need
+LaTeX are skipped when it is not installed.
+"""
+import os
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import platform
+import resource
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "05.py")
+BENCHMARKS = ["starfield", "axes_plot", "mathtex", "camera", "transition"]
+NEEDS_LATEX = {"axes_plot", "mathtex"}  # get_graph_label / MathTex compile through LaTeX
+RESOLUTIONS = ["480p15", "1080p30"]
+
+
+def parse_resolution(name):
+    """'720p30' -> (1280, 720, 30): 16:9 at the given height and frame rate."""
+    height, frame_rate = name.split("p")
+    height = int(height)
+    return int(round(height * 16 / 9 / 2)) * 2, height, int(frame_rate or 30)
+
+
+def load_script(tmp_dir):
+    """Imports 05.py as a module with its caches pointed into tmp_dir."""
+    os.environ["TTS_CACHE_DIR"] = os.path.join(tmp_dir, "audio")
+    os.environ.pop("GLYPH_CACHE_DIR", None)  # Cold Text/MathTex caches, like a fresh job
+    spec = importlib.util.spec_from_file_location("lesson05", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_benchmarks(m):
+    """Scene classes for every benchmark, built on the loaded 05.py module m."""
+    from manim import (DOWN, LEFT, ORIGIN, RIGHT, UP, Axes, Circle, Create, Dot, FadeIn, MathTex, Rectangle,
+                       Square, Text, ValueTracker, VGroup, Write, always_redraw, config)
+
+    class Benchmark(m.CombinedScene):
+        def construct(self):
+            self.clock = m.SceneClock(self)
+            self.run()
+
+        def add_background(self, color=m.MY_DARK_BLUE):
+            bg = Rectangle(width=config.frame_width, height=config.frame_height,
+                           fill_color=color, fill_opacity=1.0, stroke_width=0)
+            bg.set_z_index(-10)
+            self.add(bg)
+
+    class StarfieldBenchmark(Benchmark):
+        def run(self):
+            self.add_background()
+            stars = m.Starfield(num_stars=200, radius=0.02, color=m.MY_WHITE)
+            stars.add_updater(self.star_updater)
+            self.add(stars, Text("星空背景 Starfield", font_size=48, color=m.MY_WHITE).to_edge(UP))
+            self.wait(4)
+
+    class AxesPlotBenchmark(Benchmark):
+        def run(self):
+            self.add_background(m.MY_WHITE)
+            axes = Axes(x_range=[-3, 3, 1], y_range=[0, 9, 1], x_length=6, y_length=5,
+                        axis_config={"color": m.MY_BLACK, "stroke_width": 2}, tips=False)
+            parabola = axes.plot(lambda x: x ** 2, color=m.MY_ORANGE, stroke_width=3)
+            label = axes.get_graph_label(parabola, label="f(x)=x^2", x_val=2)
+            a = ValueTracker(-1.5)
+            dot = always_redraw(lambda: Dot(axes.c2p(a.get_value(), a.get_value() ** 2), color=m.MY_RED))
+            tangent = always_redraw(lambda: axes.plot(
+                lambda x: 2 * a.get_value() * (x - a.get_value()) + a.get_value() ** 2,
+                x_range=[a.get_value() - 1.5, a.get_value() + 1.5], color=m.MY_GOLD, stroke_width=3))
+            self.play(Create(axes), run_time=1)
+            self.play(Create(parabola), Write(label), run_time=1.5)
+            self.play(FadeIn(dot), Create(tangent), run_time=1)
+            self.play(a.animate.set_value(1.5), run_time=3)
+
+    class MathTexBenchmark(Benchmark):
+        def run(self):
+            self.add_background(m.MY_WHITE)
+            steps = VGroup(*[MathTex(tex, font_size=32, color=m.MY_BLACK) for tex in [
+                r"f(x) = x^2", r"f'(x) = 2x, \quad f'(a) = 2a", r"(a, a^2)",
+                r"y - a^2 = 2a(x - a)", r"y = 2a(x - a) + a^2", r"y = 2ax - a^2",
+            ]]).arrange(DOWN, aligned_edge=LEFT, buff=0.35)
+            for step in steps:
+                self.play(Write(step), run_time=1)
+            self.wait(1)
+
+    class CameraBenchmark(Benchmark):
+        def run(self):
+            self.add_background()
+            shapes = VGroup(*[Square(0.8, color=m.MY_ORANGE).shift(LEFT * 3 + UP * i) for i in (-1, 0, 1)],
+                            *[Circle(0.4, color=m.MY_GOLD).shift(RIGHT * 3 + UP * i) for i in (-1, 0, 1)])
+            self.add(shapes, Text("镜头移动 Camera", font_size=40, color=m.MY_WHITE))
+            self.play(self.camera.frame.animate.scale(1.1), run_time=1.5)
+            self.play(self.camera.frame.animate.move_to(RIGHT * 2), run_time=1.5)
+            self.play(self.camera.frame.animate.scale(1 / 1.1).move_to(ORIGIN), run_time=1.5)
+
+    class TransitionBenchmark(Benchmark):
+        def run(self):
+            for i in range(3):
+                self.add_background()
+                stars = m.Starfield(num_stars=200, radius=0.02, color=m.MY_WHITE)
+                self.add(stars, self.get_scene_number(f"0{i + 1}"),
+                         Text("过渡动画 Transition", font_size=48, color=m.MY_WHITE).to_edge(UP),
+                         VGroup(*[Square(0.6, color=m.MY_ORANGE).shift(RIGHT * x) for x in range(-3, 4)]))
+                self.clear_and_reset()
+
+    return {
+        "starfield": StarfieldBenchmark,
+        "axes_plot": AxesPlotBenchmark,
+        "mathtex": MathTexBenchmark,
+        "camera": CameraBenchmark,
+        "transition": TransitionBenchmark,
+    }
+
+
+def _run_benchmark(name, resolution):
+    """Benchmark process: renders one benchmark at one resolution and returns its measurements."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        m = load_script(tmp_dir)
+        from manim import config
+        width, height, frame_rate = parse_resolution(resolution)
+        config.pixel_width, config.pixel_height, config.frame_rate = width, height, frame_rate
+        config.media_dir = os.path.join(tmp_dir, "media")
+        config.output_file = name
+        config.disable_caching = True
+        m.PROFILE_RENDER = False
+
+        scene = make_benchmarks(m)[name]()
+        scene.render()
+        report = m.profiler.report()
+    frames = report["counters"].get("frames_written", 0)
+    return {
+        "benchmark": name,
+        "resolution": resolution,
+        "frames": frames,
+        "frames_rasterized": report["counters"].get("frames_rasterized", 0),
+        "video_seconds": scene.renderer.time,
+        "wall_seconds": report["wall_seconds"],
+        "fps": frames / report["wall_seconds"] if report["wall_seconds"] else 0.0,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,  # KiB on Linux
+        "phases": {phase: value["seconds"] for phase, value in report["phases"].items()},
+    }
+
+
+def machine_info():
+    from manim import __version__ as manim_version
+    import numpy
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "manim": manim_version,
+        "numpy": numpy.__version__,
+    }
+
+
+def run_benchmarks(names=None, resolutions=None, repeat=1):
+    """Runs every benchmark at every resolution, keeping the fastest of `repeat` runs."""
+    has_latex = shutil.which("latex") is not None
+    results = []
+    # spawn: every run starts from a fresh interpreter, like a render job does
+    context = multiprocessing.get_context("spawn")
+    for name in names or BENCHMARKS:
+        for resolution in resolutions or RESOLUTIONS:
+            if name in NEEDS_LATEX and not has_latex:
+                results.append({"benchmark": name, "resolution": resolution, "skipped": "latex not found"})
+                print(f"{name:<12} {resolution:<8} skipped (latex not found)")
+                continue
+            runs = []
+            for _ in range(repeat):
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    runs.append(pool.submit(_run_benchmark, name, resolution).result())
+            best = min(runs, key=lambda run: run["wall_seconds"])
+            best["runs_wall_seconds"] = [run["wall_seconds"] for run in runs]
+            results.append(best)
+            print(f"{name:<12} {resolution:<8} {best['fps']:7.1f} fps  {best['wall_seconds']:6.2f}s  "
+                  f"{best['peak_rss_mb']:7.1f} MB peak")
+    return {"machine": machine_info(), "results": results}
+
+
+def compare(before, after):
+    """Prints fps and peak RSS of `after` relative to `before` for every benchmark both measured."""
+    previous = {(r["benchmark"], r["resolution"]): r for r in before["results"] if "skipped" not in r}
+    for result in after["results"]:
+        old = previous.get((result["benchmark"], result["resolution"]))
+        if "skipped" in result or not old:
+            continue
+        fps_change = (result["fps"] / old["fps"] - 1) * 100 if old["fps"] else 0.0
+        print(f"{result['benchmark']:<12} {result['resolution']:<8} "
+              f"fps {old['fps']:7.1f} -> {result['fps']:7.1f} ({fps_change:+.1f}%)  "
+              f"peak {old['peak_rss_mb']:.0f} -> {result['peak_rss_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render benchmarks for 05.py")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="benchmarks to run (default: all)")
+    parser.add_argument("--resolutions", nargs="+", default=RESOLUTIONS, metavar="HEIGHTpFPS",
+                        help=f"e.g. 480p15 720p30 1080p30 (default: {' '.join(RESOLUTIONS)})")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per benchmark; the fastest is reported")
+    parser.add_argument("--output", default="bench.json", help="JSON results file")
+    parser.add_argument("--compare", metavar="JSON", help="results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.only, args.resolutions, args.repeat)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Results -> {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
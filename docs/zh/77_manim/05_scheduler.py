@@ -0,0 +1,430 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-job render scheduler for 05.py-style scene scripts.
+
+Rendering one job at a time leaves the CPU idle while narration downloads and the network idle
+while frames rasterize. This scheduler splits every job into stages and runs the stages of many
+jobs at once, each on the pool for the resource it uses:
+
+    tts     network  narration downloaded into the TTS cache                      (threads)
+    assets  cpu      scene-cache lookup, then a dry run of the scenes to render    (processes)
+                     that compiles every Text / MathTex SVG into the job's caches
+    scene   cpu      one task per scene method not in the scene cache              (processes)
+    mux     io       scene movies and their audio joined into the final movie     (threads, ffmpeg)
+
+    python 05_scheduler.py jobs.jsonl --cpu 8 --network 2 --report report.json
+
+jobs.jsonl has one job per line, with the fields of a 05_worker.py job plus "id" and "priority"
+(lower runs first):
+
+    {"id": "lesson_42", "script": "05.py", "config": {"output_file": "lesson_42"}, "priority": 0}
+
+Whenever a pool slot frees up, it takes the highest-priority queued task; within a priority, earlier
+jobs go first, so a job's scenes are not starved by jobs submitted after it. Cancelling a job drops
+its queued tasks; tasks already running finish and their results are discarded.
+Scene renders run in spawned processes, so this file must be run as a script (like 05.py --parallel).
+"""
+import os
+import argparse
+import heapq
+import importlib.util
+import itertools
+import json
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+NETWORK_SLOTS = 2  # Jobs downloading narration at once; each download stage has its own parallel requests
+IO_SLOTS = 2  # Final muxes at once (ffmpeg, stream copy + AAC)
+MODULES_PER_PROCESS = 8  # Loaded job scripts kept per process
+
+
+def _load_sibling(file_name, module_name):
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(HERE, file_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+DEFAULT_JOB_CONFIG = _load_sibling("05_worker.py", "render_worker").DEFAULT_JOB_CONFIG
+
+
+# -----------------------------
+# Stage functions：在各资源池中执行
+# -----------------------------
+_modules = {}
+_load_lock = threading.Lock()
+
+
+def load_job(job):
+    """
+    The job's script as a module, loaded once per process with the job's environment applied
+    (scripts read settings like TTS_CACHE_DIR at import time). Thread stages share the process,
+    so the environment is only swapped in while the script is imported.
+    """
+    with _load_lock:
+        module = _modules.get(job["id"])
+        if module is None:
+            saved = {key: os.environ.get(key) for key in job["env"]}
+            os.environ.update(job["env"])
+            try:
+                spec = importlib.util.spec_from_file_location(f"job_{job['id']}", job["script"])
+                module = importlib.util.module_from_spec(spec)
+                sys.modules[spec.name] = module  # inspect.getsource (TTS prefetch, fingerprints) looks it up by name
+                spec.loader.exec_module(module)
+            finally:
+                for key, value in saved.items():
+                    if value is None:
+                        os.environ.pop(key, None)
+                    else:
+                        os.environ[key] = value
+            _modules[job["id"]] = module
+            while len(_modules) > MODULES_PER_PROCESS:
+                sys.modules.pop(_modules.pop(next(iter(_modules))).__name__, None)
+        return module
+
+
+def _job_config(job):
+    """
+    manim's config for one process stage. The config is global to the process and the pool's workers
+    serve every job, so whatever the stage sets (the job's keys, the part's output_file) is put back after.
+    """
+    from manim import tempconfig
+    return tempconfig(job["config"])
+
+
+def _tts_stage(job):
+    m = load_job(job)
+    return m.prefetch_tts(m.collect_voiceover_texts(getattr(m, job["scene"])))
+
+
+def _assets_stage(job):
+    """Plans the scene tasks and compiles the text and LaTeX of the scenes that have to be rendered."""
+    m = load_job(job)
+    with _job_config(job):
+        from manim import config
+        scene_cls = getattr(m, job["scene"])
+        render_config = {key: config[key] for key in m.RENDER_CONFIG_KEYS}
+        cache_dir, cache_files, part_files = m.plan_scene_parts(scene_cls, render_config, job["scene_cache"])
+        pending = [(i, name) for i, name in enumerate(scene_cls.SCENES, start=1) if name not in part_files]
+        if pending:
+            # construct() without frames builds every mobject, leaving their SVGs in the job's Text/Tex dirs
+            profile_render, m.PROFILE_RENDER = m.PROFILE_RENDER, False  # The job's scene stages still profile
+            try:
+                compile_cls = type(f"{scene_cls.__name__}Assets", (scene_cls,),
+                                   {"scene_methods": [name for _, name in pending]})
+                compile_cls(dry_run=True).render()
+            finally:
+                m.PROFILE_RENDER = profile_render
+    return {
+        "scenes": list(scene_cls.SCENES),
+        "render_config": render_config,
+        "cache_dir": cache_dir,
+        "cache_files": cache_files,
+        "part_files": part_files,
+        "pending": pending,
+        "output_file": m.parallel_output_file(render_config),
+    }
+
+
+def _scene_stage(job, index, name, render_config, cache_file):
+    m = load_job(job)
+    with _job_config(job):
+        part_file = m._render_scene_part(getattr(m, job["scene"]), index, name, render_config)
+    if cache_file:
+        m.store_scene_part(part_file, cache_file)
+    return part_file
+
+
+def _mux_stage(job, part_files, output_file, cache_dir):
+    m = load_job(job)
+    m.concat_scene_parts(part_files, output_file)
+    if cache_dir:
+        m.evict_scene_cache(cache_dir)
+    return output_file
+
+
+# -----------------------------
+# Scheduler：按资源类型分池、按优先级调度
+# -----------------------------
+class Job:
+    """One render job and the progress of its stages."""
+
+    def __init__(self, spec, seq):
+        self.seq = seq
+        self.id = str(spec.get("id") or f"job{seq:03d}")
+        self.priority = spec.get("priority", 0)
+        cwd = spec.get("cwd") or os.getcwd()
+        job_config = {**DEFAULT_JOB_CONFIG, "output_file": self.id, **spec.get("config", {})}
+        # Threads of this process serve every job, so nothing may depend on the current directory
+        job_config["media_dir"] = os.path.join(cwd, job_config["media_dir"])
+        env = {"TTS_CACHE_DIR": os.path.join(job_config["media_dir"], "audio")}  # 05.py's default, 07/audio
+        env.update({key: str(value) for key, value in spec.get("env", {}).items()})
+        self.spec = {
+            "id": self.id,
+            "script": os.path.join(cwd, spec["script"]),
+            "scene": spec.get("scene", "CombinedScene"),
+            "config": job_config,
+            "env": env,
+            "scene_cache": spec.get("scene_cache", True),
+        }
+        self.state = "queued"  # queued -> running -> done | failed | cancelled
+        self.error = None
+        self.output = None
+        self.plan = None
+        self.part_files = {}
+        self.scenes_left = 0
+        self.submitted = time.perf_counter()
+        self.finished = None
+        self.tasks = []  # {"stage", "name", "queued", "started", "ended"}
+        self.done = threading.Event()
+
+    @property
+    def closed(self):
+        return self.state in ("done", "failed", "cancelled")
+
+    def report(self):
+        stages = {}
+        for task in self.tasks:
+            if task.get("ended") is None:
+                continue
+            stage = stages.setdefault(task["stage"], {"tasks": 0, "seconds": 0.0, "queue_seconds": 0.0})
+            stage["tasks"] += 1
+            stage["seconds"] += task["ended"] - task["started"]
+            stage["queue_seconds"] += task["started"] - task["queued"]
+        return {
+            "id": self.id,
+            "priority": self.priority,
+            "state": self.state,
+            "output": self.output,
+            "error": self.error,
+            "seconds": (self.finished or time.perf_counter()) - self.submitted,
+            "scenes_rendered": len(self.plan["pending"]) if self.plan else None,
+            "scenes_reused": len(self.plan["part_files"]) if self.plan else None,
+            "stages": stages,
+        }
+
+
+class ResourcePool:
+    """
+    Worker pool for one resource type. Tasks wait in a priority queue and are handed to the executor
+    only when a slot is free, so a high-priority task submitted late still runs next.
+    """
+
+    def __init__(self, name, executor, slots, events):
+        self.name = name
+        self.executor = executor
+        self.slots = slots
+        self.events = events  # Finished tasks go to the scheduler's event thread, never run on executor threads
+        self.running = 0
+        self.busy_seconds = 0.0
+        self._queue = []
+        self._lock = threading.Lock()
+        self._order = itertools.count()
+
+    def submit(self, job, task, fn, args, on_done):
+        """Queues fn(*args) for job; on_done(future) runs when it finishes."""
+        task["queued"] = time.perf_counter()
+        job.tasks.append(task)
+        with self._lock:
+            heapq.heappush(self._queue, (job.priority, job.seq, next(self._order), job, task, fn, args, on_done))
+        self._dispatch()
+
+    def _dispatch(self):
+        with self._lock:
+            while self.running < self.slots and self._queue:
+                _, _, _, job, task, fn, args, on_done = heapq.heappop(self._queue)
+                if job.closed:
+                    continue  # Cancelled or failed while queued
+                self.running += 1
+                task["started"] = time.perf_counter()
+                future = self.executor.submit(fn, *args)
+                future.add_done_callback(lambda f, task=task, on_done=on_done: self.events.put((self, f, task, on_done)))
+
+    def finished(self, future, task, on_done):
+        """Event thread: frees the slot, runs the task's continuation and starts the next task."""
+        task["ended"] = time.perf_counter()
+        with self._lock:
+            self.running -= 1
+            self.busy_seconds += task["ended"] - task["started"]
+        try:
+            on_done(future)
+        finally:
+            self._dispatch()
+
+    def queued(self):
+        with self._lock:
+            return sum(1 for entry in self._queue if not entry[3].closed)
+
+
+class Scheduler:
+    """
+    Runs the stages of many jobs concurrently on separate pools per resource type:
+    network (narration), cpu (asset compile and scene renders) and io (final mux).
+    """
+
+    def __init__(self, cpu=None, network=NETWORK_SLOTS, io=IO_SLOTS):
+        cpu = cpu or os.cpu_count() or 1
+        self.started = time.perf_counter()
+        self._events = queue.Queue()
+        # spawn: a clean interpreter per worker instead of a forked copy of Cairo/Pango state
+        self.pools = {
+            "network": ResourcePool("network", ThreadPoolExecutor(max_workers=network), network, self._events),
+            "cpu": ResourcePool("cpu", ProcessPoolExecutor(max_workers=cpu,
+                                                           mp_context=multiprocessing.get_context("spawn")),
+                                cpu, self._events),
+            "io": ResourcePool("io", ThreadPoolExecutor(max_workers=io), io, self._events),
+        }
+        self.jobs = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._event_thread = threading.Thread(target=self._event_loop, daemon=True)
+        self._event_thread.start()
+
+    def _event_loop(self):
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            pool, future, task, on_done = event
+            pool.finished(future, task, on_done)
+
+    def submit(self, spec):
+        """Queues a job (a dict like one line of jobs.jsonl) and returns its Job."""
+        job = Job(spec, next(self._seq))
+        with self._lock:
+            if job.id in self.jobs:
+                raise ValueError(f"Duplicate job id {job.id}")
+            self.jobs[job.id] = job
+        self._run(job, "network", {"stage": "tts"}, _tts_stage, (job.spec,), self._tts_done)
+        return job
+
+    def cancel(self, job_id):
+        """Drops the job's queued tasks; running ones finish and are ignored. Returns False if it already ended."""
+        job = self.jobs[job_id]
+        with self._lock:
+            if job.closed:
+                return False
+            self._close(job, "cancelled")
+        print(f"[{job.id}] cancelled")
+        return True
+
+    def wait(self, timeout=None):
+        """Waits for every submitted job to end. Returns True if all did."""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        for job in list(self.jobs.values()):
+            if not job.done.wait(None if deadline is None else max(0.0, deadline - time.perf_counter())):
+                return False
+        return True
+
+    def shutdown(self):
+        for pool in self.pools.values():
+            pool.executor.shutdown(wait=True, cancel_futures=True)
+        self._events.put(None)
+        self._event_thread.join()
+
+    def report(self):
+        wall = time.perf_counter() - self.started
+        return {
+            "wall_seconds": wall,
+            "pools": {name: {"slots": pool.slots, "busy_seconds": pool.busy_seconds,
+                             "utilization": pool.busy_seconds / (wall * pool.slots) if wall else 0.0}
+                      for name, pool in self.pools.items()},
+            "jobs": [job.report() for job in self.jobs.values()],
+        }
+
+    def _run(self, job, pool, task, fn, args, on_done):
+        job.state = "running" if job.state == "queued" else job.state
+        self.pools[pool].submit(job, task, fn, args, lambda future: self._step(job, task, future, on_done))
+
+    def _step(self, job, task, future, on_done):
+        """Common part of every stage callback: ignores ended jobs and fails the job on errors."""
+        with self._lock:
+            if job.closed:
+                return
+            error = future.exception()
+            if error is not None:
+                job.error = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+                self._close(job, "failed")
+                print(f"[{job.id}] {task['stage']} failed: {error}")
+                return
+            on_done(job, future.result())
+
+    def _close(self, job, state):
+        job.state = state
+        job.finished = time.perf_counter()
+        job.done.set()
+
+    # Stage transitions; called with self._lock held
+    def _tts_done(self, job, fetched):
+        print(f"[{job.id}] narration ready ({fetched} line(s) downloaded)")
+        self._run(job, "cpu", {"stage": "assets"}, _assets_stage, (job.spec,), self._assets_done)
+
+    def _assets_done(self, job, plan):
+        job.plan = plan
+        job.part_files = dict(plan["part_files"])
+        job.scenes_left = len(plan["pending"])
+        print(f"[{job.id}] {len(plan['pending'])} scene(s) to render, {len(plan['part_files'])} reused")
+        if not plan["pending"]:
+            self._mux(job)
+        for index, name in plan["pending"]:
+            self._run(job, "cpu", {"stage": "scene", "name": name}, _scene_stage,
+                      (job.spec, index, name, plan["render_config"], plan["cache_files"].get(name)),
+                      lambda job, part_file, name=name: self._scene_done(job, name, part_file))
+
+    def _scene_done(self, job, name, part_file):
+        job.part_files[name] = part_file
+        job.scenes_left -= 1
+        if not job.scenes_left:
+            self._mux(job)
+
+    def _mux(self, job):
+        part_files = [job.part_files[name] for name in job.plan["scenes"]]
+        cache_dir = job.plan["cache_dir"] if job.plan["cache_files"] and job.plan["pending"] else None
+        self._run(job, "io", {"stage": "mux"}, _mux_stage,
+                  (job.spec, part_files, job.plan["output_file"], cache_dir), self._mux_done)
+
+    def _mux_done(self, job, output_file):
+        job.output = output_file
+        self._close(job, "done")
+        print(f"[{job.id}] done in {job.finished - job.submitted:.1f}s -> {output_file}")
+
+
+def read_jobs(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-job render scheduler for manim scene scripts")
+    parser.add_argument("jobs", help="JSON lines file, one job per line")
+    parser.add_argument("--cpu", type=int, help="asset compile / scene render processes (default: CPU count)")
+    parser.add_argument("--network", type=int, default=NETWORK_SLOTS, help="jobs downloading narration at once")
+    parser.add_argument("--io", type=int, default=IO_SLOTS, help="final muxes at once")
+    parser.add_argument("--report", help="write the per-job and per-pool report as JSON")
+    args = parser.parse_args()
+
+    scheduler = Scheduler(args.cpu, args.network, args.io)
+    for spec in read_jobs(args.jobs):
+        scheduler.submit(spec)
+    try:
+        while not scheduler.wait(timeout=1):
+            pass
+    except KeyboardInterrupt:
+        print("Cancelling queued work; waiting for running tasks...")
+        for job_id in list(scheduler.jobs):
+            scheduler.cancel(job_id)
+    scheduler.shutdown()
+
+    report = scheduler.report()
+    for job in report["jobs"]:
+        print(f"{job['id']:<16} {job['state']:<9} {job['seconds']:7.1f}s  {job['output'] or job['error'] or ''}".rstrip())
+    print("  ".join(f"{name} {pool['utilization']:.0%} busy" for name, pool in report["pools"].items()))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Checks 05.py's render shortcuts against real renders: a dry run's timeline has to match the movie
+it stands in for, still holds (written as two-frame segments) must not shorten a movie or its
+--parallel parts, and a frame rendered on its own has to match the same frame of a full render.
+
+    python -m pytest 05_test.py
+
+Needs manim and ffmpeg (and LaTeX for the frame check); without them every test is skipped.
+Narration comes from the 05_tts_stub.py stand-in, so no network is used.
+"""
+import os
+import importlib.util
+import shutil
+import sys
+
+import numpy as np
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PIXEL_WIDTH, PIXEL_HEIGHT, FRAME_RATE = 480, 270, 30
+FRAME_WINDOW = 2  # Frames either side of the target the full render keeps for comparison
+
+
+def load_script(file_name, module_name):
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(HERE, file_name))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module  # inspect.getsource (TTS prefetch) looks the module up by name
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def m(tmp_path_factory):
+    """05.py loaded against a local TTS stand-in, rendering small and fast into a temporary media_dir."""
+    pytest.importorskip("manim")
+    pytest.importorskip("av")
+    if not shutil.which("ffmpeg"):
+        pytest.skip("ffmpeg not found")
+    tmp_dir = tmp_path_factory.mktemp("lesson05")
+    stub = load_script("05_tts_stub.py", "tts_stub")
+    server = stub.start_server(port=0, latency=0.0, jitter=0.0)
+    saved = {key: os.environ.get(key) for key in ("TTS_BASE_URL", "TTS_CACHE_DIR")}
+    os.environ["TTS_BASE_URL"] = f"http://{stub.STUB_HOST}:{server.server_address[1]}{stub.STUB_PATH}"
+    os.environ["TTS_CACHE_DIR"] = str(tmp_dir / "audio")
+    try:
+        module = load_script("05.py", "lesson05")
+        module.PROFILE_RENDER = False
+        from manim import tempconfig
+        with tempconfig({"pixel_width": PIXEL_WIDTH, "pixel_height": PIXEL_HEIGHT, "frame_rate": FRAME_RATE,
+                         "media_dir": str(tmp_dir / "media"), "disable_caching": True}):
+            yield module
+    finally:
+        server.shutdown()
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def test_dry_run_timeline_matches_render(m, tmp_path):
+    import av
+    from manim import RIGHT, Create, Square, config
+
+    class SmallScene(m.CombinedScene):
+        SCENES = ["play_small"]
+
+        def play_small(self):
+            square = Square()
+            self.play(Create(square), run_time=1.2)
+            self.wait(0.5)
+            self.play(square.animate.shift(RIGHT), run_time=0.8)
+            self.wait(1)
+
+    config.output_file = "small"
+    timeline = m.dry_run_timeline(SmallScene, str(tmp_path / "small.timeline.json"))
+    scene = SmallScene()
+    scene.render()
+    movie_file = str(scene.renderer.file_writer.movie_file_path)
+    with av.open(movie_file) as container:
+        declared = container.duration / av.time_base
+
+    # A real render rounds every play to whole frames; a dry run does not
+    tolerance = len(timeline["animations"]) / FRAME_RATE
+    assert timeline["total_seconds"] == pytest.approx(scene.renderer.time, abs=tolerance)
+    # SmallScene ends in a still hold, which the container header used to leave out
+    assert timeline["total_seconds"] == pytest.approx(declared, abs=tolerance)
+    assert timeline["total_seconds"] == pytest.approx(m.probe_movie(movie_file)[0], abs=tolerance)
+    assert timeline["scenes"][0]["end"] == pytest.approx(timeline["total_seconds"], abs=tolerance)
+
+
+def test_movie_ending_in_still_hold_keeps_its_length(m):
+    """manim concatenates partial movies with dts=None; a still hold at the very end must still count in full."""
+    import av
+    from manim import Create, Square, config
+
+    class StillEnding(m.CombinedScene):
+        SCENES = ["play_outro"]
+
+        def play_outro(self):
+            with m.custom_voiceover_tts("最后一句旁白") as tracker:
+                self.add_sound(tracker.audio_path, time_offset=0)
+                self.play(Create(Square()), run_time=1)
+            self.wait(2)  # Frozen frame: written by write_still
+
+    config.output_file = "still_ending"
+    scene = StillEnding()
+    scene.render()
+    movie_file = str(scene.renderer.file_writer.movie_file_path)
+    with av.open(movie_file) as container:
+        declared = container.duration / av.time_base
+        audio_seconds = float(container.streams.audio[0].duration * container.streams.audio[0].time_base)
+
+    video_seconds, has_audio = m.probe_movie(movie_file)
+    assert has_audio
+    assert video_seconds == pytest.approx(scene.renderer.time, abs=1 / FRAME_RATE)
+    assert declared == pytest.approx(video_seconds, abs=1 / FRAME_RATE)
+    assert audio_seconds == pytest.approx(video_seconds, abs=0.1)  # The hold keeps its (padded) audio
+
+
+def test_parallel_parts_add_up_to_serial_render(m, tmp_path):
+    """Every --parallel part ends in clear_and_reset's still hold; the stitched movie must be as long as a serial render."""
+    import av
+    from manim import Circle, Create, FadeIn, Square, config
+
+    class TwoScenes(m.CombinedScene):
+        SCENES = ["play_first", "play_outro"]
+
+        def play_first(self):
+            with m.custom_voiceover_tts("第一段旁白") as tracker:
+                self.add_sound(tracker.audio_path, time_offset=0)
+                self.play(Create(Square()), run_time=1)
+            self.wait(0.5)
+
+        def play_outro(self):
+            with m.custom_voiceover_tts("最后一段旁白") as tracker:
+                self.add_sound(tracker.audio_path, time_offset=0)
+                self.play(FadeIn(Circle()), run_time=1)
+            self.wait(2)
+
+    config.output_file = "two_scenes"
+    serial = TwoScenes()
+    serial.render()
+    serial_seconds, _ = m.probe_movie(str(serial.renderer.file_writer.movie_file_path))
+
+    # The parts render_scenes_parallel's workers produce, rendered here: spawned workers cannot import a test-local class
+    render_config = {key: config[key] for key in m.RENDER_CONFIG_KEYS}
+    part_files = [m._render_scene_part(TwoScenes, index, name, render_config)
+                  for index, name in enumerate(TwoScenes.SCENES, start=1)]
+    output_file = m.concat_scene_parts(part_files, str(tmp_path / "two_scenes_parallel.mp4"))
+    with av.open(output_file) as container:
+        declared = container.duration / av.time_base
+        audio_seconds = float(container.streams.audio[0].duration * container.streams.audio[0].time_base)
+
+    parallel_seconds, _ = m.probe_movie(output_file)
+    assert parallel_seconds == pytest.approx(serial_seconds, abs=1 / FRAME_RATE)
+    assert declared == pytest.approx(serial_seconds, abs=1 / FRAME_RATE)
+    assert audio_seconds == pytest.approx(serial_seconds, abs=0.1)
+
+
+def test_render_frames_matches_full_render(m, tmp_path, monkeypatch):
+    from manim import config
+    from PIL import Image
+
+    if not shutil.which("latex"):
+        pytest.skip("LaTeX not found")
+    monkeypatch.setattr(m, "STILL_HOLDS", False)  # Every frame goes through add_frame
+    scene_seconds = 7.5
+
+    class FirstScenes(m.CombinedScene):
+        SCENES = m.CombinedScene.SCENES[:3]
+
+        def __init__(self, **kwargs):
+            super().__init__(random_seed=0, **kwargs)  # Same star field in both renders
+
+    class RecordingRenderer(m.CombinedSceneRenderer):
+        """Keeps a copy of the frames around target_frame (counted from the start of the movie)."""
+        target_frame = None
+
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self.frames_seen = 0
+            self.recorded = {}
+
+        def add_frame(self, frame, num_frames=1):
+            if not self.skip_animations:
+                for index in range(self.frames_seen, self.frames_seen + num_frames):
+                    if self.target_frame is not None and abs(index - self.target_frame) <= FRAME_WINDOW:
+                        self.recorded[index] = frame.copy()  # Ring buffers are reused once encoded
+                self.frames_seen += num_frames
+            return super().add_frame(frame, num_frames)
+
+    class FullRender(FirstScenes):
+        def play_scene_03(self):
+            self.renderer.target_frame = round((self.renderer.time + scene_seconds) * config.frame_rate)
+            super().play_scene_03()
+
+    png = tmp_path / "frame.png"
+    config.output_file = "first_scenes"
+    m.render_frames([("play_scene_03", scene_seconds, str(png))], FirstScenes)
+    captured = np.asarray(Image.open(png).convert("RGBA")).astype(np.int16)
+
+    scene = FullRender(renderer=RecordingRenderer())
+    scene.render()
+    frames = scene.renderer.recorded
+    assert scene.renderer.target_frame in frames
+
+    # A real render rounds every play up to whole frames and a dry run does not, so the two clocks
+    # may be a frame or two apart by 7.5 s into the scene: the closest frame has to be the same picture
+    differences = {index: np.abs(frame.astype(np.int16) - captured) for index, frame in frames.items()}
+    closest = min(differences, key=lambda index: differences[index].mean())
+    assert abs(closest - scene.renderer.target_frame) <= FRAME_WINDOW
+    assert differences[closest].mean() < 0.5
+    assert (differences[closest] > 16).mean() < 0.001
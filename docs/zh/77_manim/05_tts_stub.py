@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+Offline stand-in for the TTS service used by 05.py, plus a load harness for the voiceover path.
+
+    python 05_tts_stub.py serve --latency 0.8 --jitter 0.4 --error-rate 0.05
+    TTS_BASE_URL=http://127.0.0.1:8765/api/manim/tts python 05.py --draft
+
+    python 05_tts_stub.py load --concurrency 8 --jobs 32 --distinct
+
+serve: answers GET /api/manim/tts?token=..&input=..[&voice_id=..&platform=..&speed=..&format=..] like the
+real service, with deterministic audio (the same request always returns the same bytes) whose length
+follows the text like real speech. Latency, jitter, error rate and slow responses are configurable.
+GET /stats returns request counts and the peak number of requests in flight.
+
+load: runs N render jobs at once, each in its own process with 05.py loaded, through the voiceover
+path exactly as CombinedScene does it (prefetch in setup, then custom_voiceover_tts per line).
+Reports fetch latency percentiles, retries, cache hit rate and time to first frame (when the first
+scene has its narration and could start drawing). Starts a stub server itself unless --base-url is given.
+"""
+import os
+import argparse
+import hashlib
+import importlib.util
+import io
+import json
+import multiprocessing
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "05.py")
+FFMPEG_BIN = os.environ.get("FFMPEG_BIN", "ffmpeg")
+
+STUB_HOST = "127.0.0.1"
+STUB_PORT = 8765
+STUB_PATH = "/api/manim/tts"
+STUB_TOKEN = "123456"  # Same default token as 05.py
+
+SAMPLE_RATE = 24000
+SECONDS_PER_CHAR = 0.22  # About 4.5 Chinese characters per second, like the real voices
+LEAD_SECONDS = 0.35  # Extra length every line gets, like the real voices' lead-in and tail
+
+
+def synthesize(text, voice="", speed=1.0, fmt="mp3"):
+    """Deterministic stand-in audio for text: a tone keyed by the text, as long as the speech would be."""
+    seed = int(hashlib.sha256(f"{voice}\0{text}".encode("utf-8")).hexdigest()[:8], 16)
+    duration = (LEAD_SECONDS + len(text) * SECONDS_PER_CHAR) / (speed or 1.0)
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    frequency = 180 + seed % 120
+    # Syllable-rate amplitude envelope so the clip is not one flat tone
+    samples = 8000 * (0.6 + 0.4 * np.sin(2 * np.pi * 4.5 * t)) * np.sin(2 * np.pi * frequency * t)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(samples.astype("<i2").tobytes())
+    audio = buffer.getvalue()
+    if fmt != "wav" and shutil.which(FFMPEG_BIN):
+        audio = subprocess.run([FFMPEG_BIN, "-loglevel", "error", "-f", "wav", "-i", "pipe:0",
+                                "-f", fmt, "-b:a", "48k", "pipe:1"],
+                               input=audio, stdout=subprocess.PIPE, check=True).stdout
+    return audio
+
+
+class StubTTSServer(ThreadingHTTPServer):
+    """The stand-in service: deterministic audio with injected latency and errors."""
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.5, jitter=0.2, error_rate=0.0, error_status=503,
+                 slow_rate=0.0, slow_seconds=30.0, token=STUB_TOKEN, seed=0):
+        super().__init__(address, StubTTSHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.slow_rate = slow_rate
+        self.slow_seconds = slow_seconds
+        self.token = token
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.audio = {}  # Synthesized once per (text, voice, speed, format)
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "slow": 0, "in_flight": 0, "peak_in_flight": 0}
+
+    def draw(self):
+        """One request's fate: (delay, fail, slow), decided under the lock so a seed reproduces a run."""
+        with self.lock:
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            return delay, self.random.random() < self.error_rate, self.random.random() < self.slow_rate
+
+    def count(self, **changes):
+        with self.lock:
+            for key, value in changes.items():
+                self.stats[key] += value
+            self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.stats["in_flight"])
+
+    def get_audio(self, text, voice, speed, fmt):
+        key = (text, voice, speed, fmt)
+        with self.lock:
+            audio = self.audio.get(key)
+        if audio is None:
+            audio = synthesize(text, voice, speed, fmt)
+            with self.lock:
+                self.audio[key] = audio
+        return audio
+
+
+class StubTTSHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the pooled client expects
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/stats":
+            with self.server.lock:
+                self._send(200, json.dumps(self.server.stats).encode("utf-8"), "application/json")
+            return
+        if url.path != STUB_PATH:
+            self._send(404, b"not found", "text/plain")
+            return
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if query.get("token") != self.server.token:
+            self._send(401, b"bad token", "text/plain")
+            return
+        if not query.get("input"):
+            self._send(400, b"missing input", "text/plain")
+            return
+
+        self.server.count(requests=1, in_flight=1)
+        try:
+            delay, fail, slow = self.server.draw()
+            if slow:
+                self.server.count(slow=1)
+                delay = self.server.slow_seconds  # Long enough to trip the client's timeout
+            time.sleep(delay)
+            if fail:
+                self.server.count(errors=1)
+                self._send(self.server.error_status, b"injected error", "text/plain")
+                return
+            fmt = query.get("format", "mp3")
+            audio = self.server.get_audio(query["input"], query.get("voice_id", ""),
+                                          float(query.get("speed", 1.0)), fmt)
+            self._send(200, audio, "audio/wav" if fmt == "wav" else f"audio/{fmt}")
+            self.server.count(ok=1)
+        finally:
+            self.server.count(in_flight=-1)
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client gave up (timeout); nothing to do
+
+    def log_message(self, format, *args):
+        pass  # One line per request would drown the load report
+
+
+def start_server(host=STUB_HOST, port=STUB_PORT, **options):
+    """Starts a stub server on a background thread and returns it (port 0 picks a free port)."""
+    server = StubTTSServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _voiceover_job(index, base_url, cache_dir, distinct):
+    """Load job process: one render's voiceover path, timed the way CombinedScene runs it."""
+    os.environ["TTS_BASE_URL"] = base_url
+    os.environ["TTS_CACHE_DIR"] = cache_dir
+    start = time.perf_counter()
+    spec = importlib.util.spec_from_file_location("lesson05", SCRIPT)
+    m = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = m  # inspect.getsource (collect_voiceover_texts) looks the module up by name
+    spec.loader.exec_module(m)
+    m.TTS_ALLOW_SILENT = True  # Count failures instead of aborting the job
+    client = m.get_tts_client()
+
+    texts = m.collect_voiceover_texts(m.CombinedScene)
+    if distinct:
+        texts = [f"{text}（第 {index} 课）" for text in texts]  # Another lesson: nothing shared across jobs
+    m.profiler.reset()
+    m.prefetch_tts(texts)  # CombinedScene.setup
+    first_frame = None
+    failed = 0
+    for text in texts:  # CombinedScene.construct, one voiceover block per line
+        with m.custom_voiceover_tts(text) as tracker:
+            if first_frame is None:
+                first_frame = time.perf_counter() - start
+            failed += tracker.audio_path is None
+    metrics = client.metrics
+    return {
+        "time_to_first_frame": first_frame,
+        "seconds": time.perf_counter() - start,
+        "latencies": [metric["latency"] for metric in metrics if metric["ok"]],
+        "retries": sum(metric["attempts"] - 1 for metric in metrics),
+        "failed_lines": failed,
+        "counters": dict(m.profiler.counters),
+    }
+
+
+def percentiles(values, points=(50, 90, 95, 99)):
+    if not values:
+        return {}
+    values = sorted(values)
+    return {f"p{point}": values[min(len(values) - 1, int(len(values) * point / 100))] for point in points}
+
+
+def run_load(concurrency, jobs=None, distinct=False, base_url=None, cache_dir=None, server_options=None):
+    """Runs `jobs` voiceover jobs, `concurrency` at a time, and returns the aggregated report."""
+    server = None
+    if not base_url:
+        server = start_server(port=0, **(server_options or {}))
+        base_url = f"http://{STUB_HOST}:{server.server_address[1]}{STUB_PATH}"
+    tmp_dir = None
+    if not cache_dir:
+        tmp_dir = tempfile.mkdtemp(prefix="tts_load_")  # Cold shared cache, like a fresh TTS_CACHE_DIR
+        cache_dir = tmp_dir
+    jobs = jobs or concurrency
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=concurrency, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(_voiceover_job, range(jobs), [base_url] * jobs, [cache_dir] * jobs,
+                                    [distinct] * jobs))
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        if server:
+            server.shutdown()
+
+    counters = {}
+    for result in results:
+        for key, value in result["counters"].items():
+            counters[key] = counters.get(key, 0) + value
+    lookups = counters.get("tts_cache_hit", 0) + counters.get("tts_cache_miss", 0)
+    return {
+        "jobs": jobs,
+        "concurrency": concurrency,
+        "distinct": distinct,
+        "base_url": base_url,
+        "wall_seconds": time.perf_counter() - start,
+        "fetches": sum(len(result["latencies"]) for result in results),
+        "fetch_latency": percentiles([latency for result in results for latency in result["latencies"]]),
+        "retries": sum(result["retries"] for result in results),
+        "failed_lines": sum(result["failed_lines"] for result in results),
+        "cache_hit_rate": counters.get("tts_cache_hit", 0) / lookups if lookups else None,
+        "time_to_first_frame": percentiles([result["time_to_first_frame"] for result in results
+                                            if result["time_to_first_frame"] is not None]),
+        "server": dict(server.stats) if server else None,
+        "counters": counters,
+    }
+
+
+def add_server_options(parser):
+    parser.add_argument("--latency", type=float, default=0.5, help="mean response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.2, help="uniform +/- spread around --latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="status code of injected failures")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of requests that hang")
+    parser.add_argument("--slow-seconds", type=float, default=30.0, help="how long a hanging request takes")
+    parser.add_argument("--seed", type=int, default=0, help="seed for latency and error injection")
+
+
+def server_options(args):
+    return {"latency": args.latency, "jitter": args.jitter, "error_rate": args.error_rate,
+            "error_status": args.error_status, "slow_rate": args.slow_rate, "slow_seconds": args.slow_seconds,
+            "seed": args.seed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline TTS stand-in and voiceover load harness")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="run the stand-in TTS service")
+    serve_parser.add_argument("--host", default=STUB_HOST)
+    serve_parser.add_argument("--port", type=int, default=STUB_PORT)
+    serve_parser.add_argument("--token", default=STUB_TOKEN)
+    add_server_options(serve_parser)
+
+    load_parser = commands.add_parser("load", help="drive the voiceover path with concurrent jobs")
+    load_parser.add_argument("--concurrency", type=int, default=4, help="jobs running at the same time")
+    load_parser.add_argument("--jobs", type=int, help="total jobs (default: --concurrency)")
+    load_parser.add_argument("--distinct", action="store_true",
+                             help="every job narrates different text (no cache sharing between jobs)")
+    load_parser.add_argument("--base-url", help="TTS endpoint to load (default: start a local stub)")
+    load_parser.add_argument("--cache-dir", help="TTS_CACHE_DIR for the jobs (default: a fresh, cold one)")
+    load_parser.add_argument("--output", help="also write the report as JSON")
+    add_server_options(load_parser)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = StubTTSServer((args.host, args.port), token=args.token, **server_options(args))
+        print(f"Stub TTS on http://{args.host}:{args.port}{STUB_PATH} "
+              f"(latency {args.latency}±{args.jitter}s, errors {args.error_rate:.0%}, slow {args.slow_rate:.0%})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    else:
+        report = run_load(args.concurrency, args.jobs, args.distinct, args.base_url, args.cache_dir,
+                          server_options(args))
+        print(json.dumps({key: value for key, value in report.items() if key != "counters"}, indent=2))
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
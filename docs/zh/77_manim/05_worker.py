@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Warm render worker for 05.py-style scene scripts.
+
+Starting `python 05.py` for every job pays for importing manim / numpy / requests / moviepy,
+the Cairo/Pango and CJK font setup and the first LaTeX run before a single frame is drawn.
+This worker does all of that once, then serves jobs over a local TCP socket:
+
+    python 05_worker.py serve --workers 2
+    python 05_worker.py submit 05.py --scene CombinedScene --set output_file=lesson_42
+
+Each job runs in a process forked from the warm interpreter, so it starts with everything
+loaded but shares no state with earlier jobs: config, module globals and mobjects all go
+away with the job process. Requires fork (Linux / macOS).
+
+Protocol: one JSON object per line in each direction.
+    request:  {"script": path, "scene": "CombinedScene", "config": {...}, "scene_kwargs": {...},
+               "cwd": path, "env": {...}, "timeout": seconds}
+    response: {"ok": true, "output": movie path, "seconds": ..., "startup_seconds": ...}
+              or {"ok": false, "error": traceback}
+"""
+import os
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import signal
+import socket
+import sys
+import tempfile
+import time
+import traceback
+
+WORKER_HOST = "127.0.0.1"
+WORKER_PORT = int(os.environ.get("RENDER_WORKER_PORT", "8766"))
+WORKER_PROCESSES = 1  # Jobs rendered at the same time; each one is a separate forked process
+JOB_TIMEOUT = 3600  # Seconds before a job process is killed
+
+# Same defaults as the main block of 05.py; every job can override them with "config"
+DEFAULT_JOB_CONFIG = {
+    "pixel_height": 1080,
+    "pixel_width": 1920,
+    "frame_rate": 30,
+    "disable_caching": True,
+    "media_dir": "07",
+}
+
+_fork = multiprocessing.get_context("fork")
+
+
+def warm_up():
+    """Imports and initializes everything a render needs before the first job arrives."""
+    start = time.perf_counter()
+    import av  # noqa: F401
+    import numpy  # noqa: F401
+    import requests  # noqa: F401
+    from moviepy import AudioFileClip, VideoFileClip  # noqa: F401
+    from manim import MathTex, Text, tempconfig
+    from manim.renderer.cairo_renderer import CairoRenderer  # noqa: F401
+
+    with tempfile.TemporaryDirectory() as media_dir, tempconfig({"media_dir": media_dir}):
+        # First Pango layout loads fontconfig and the CJK fonts
+        Text("预热 Warm-up 0123")
+        try:
+            # First LaTeX run loads the TeX template and the format files into the OS cache
+            MathTex(r"f(x) = x^2")
+        except Exception as e:
+            print(f"LaTeX warm-up skipped: {e}")
+    print(f"Worker warm in {time.perf_counter() - start:.1f}s")
+
+
+def _run_job(job, conn):
+    """Job process: applies the job's environment and config, renders the scene, reports back."""
+    start = time.perf_counter()
+    try:
+        if job.get("cwd"):
+            os.chdir(job["cwd"])
+        # Before the script is loaded, since scripts read settings like TTS_CACHE_DIR at import time
+        os.environ.update({key: str(value) for key, value in job.get("env", {}).items()})
+
+        from manim import config
+        scene_name = job.get("scene", "CombinedScene")
+        for key, value in {**DEFAULT_JOB_CONFIG, "output_file": scene_name, **job.get("config", {})}.items():
+            config[key] = value
+
+        script = os.path.abspath(job["script"])
+        spec = importlib.util.spec_from_file_location(f"job_{os.getpid()}", script)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = module  # inspect.getsource (TTS prefetch) looks the module up by name
+        spec.loader.exec_module(module)  # The script's __main__ block does not run
+
+        startup = time.perf_counter() - start
+        scene = getattr(module, scene_name)(**job.get("scene_kwargs", {}))
+        scene.render()
+        conn.send({
+            "ok": True,
+            "output": str(scene.renderer.file_writer.movie_file_path),
+            "seconds": time.perf_counter() - start,
+            "startup_seconds": startup,
+        })
+    except BaseException:
+        conn.send({"ok": False, "error": traceback.format_exc()})
+    finally:
+        conn.close()
+
+
+def run_job(job):
+    """Runs one job in a fresh process forked from this (warm) one and returns its response."""
+    receiver, sender = _fork.Pipe(duplex=False)
+    process = _fork.Process(target=_run_job, args=(job, sender))
+    process.start()
+    sender.close()
+    timeout = job.get("timeout", JOB_TIMEOUT)
+    try:
+        if receiver.poll(timeout):
+            return receiver.recv()
+        process.kill()
+        return {"ok": False, "error": f"Job timed out after {timeout}s"}
+    except EOFError:
+        return {"ok": False, "error": f"Job process exited with code {process.exitcode} before reporting"}
+    finally:
+        process.join()
+        receiver.close()
+
+
+def _serve_connections(server):
+    """Accept loop of one worker process; the listening socket is shared with its siblings."""
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    while True:
+        conn, _ = server.accept()
+        with conn, conn.makefile("rwb") as stream:
+            for line in stream:
+                try:
+                    job = json.loads(line)
+                    print(f"[{os.getpid()}] {job.get('script')} {job.get('scene', 'CombinedScene')}")
+                    response = run_job(job)
+                except Exception:
+                    response = {"ok": False, "error": traceback.format_exc()}
+                stream.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                stream.flush()
+
+
+def serve(host=WORKER_HOST, port=WORKER_PORT, workers=WORKER_PROCESSES):
+    """Warms up once, then serves jobs with `workers` accept loops forked from the warm process."""
+    warm_up()
+    server = socket.create_server((host, port))
+    print(f"Render worker listening on {host}:{port} with {workers} process(es)")
+    processes = []
+    try:
+        while True:
+            processes = [p for p in processes if p.is_alive()]
+            # Forked before any job ran, so a crashed accept loop is replaced by an equally warm one
+            while len(processes) < workers:
+                process = _fork.Process(target=_serve_connections, args=(server,))
+                process.start()
+                processes.append(process)
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        server.close()
+
+
+def submit_job(job, host=WORKER_HOST, port=WORKER_PORT):
+    """Sends one job to a running worker and waits for its response."""
+    with socket.create_connection((host, port)) as conn, conn.makefile("rwb") as stream:
+        stream.write(json.dumps(job, ensure_ascii=False).encode("utf-8") + b"\n")
+        stream.flush()
+        line = stream.readline()
+    if not line:
+        raise ConnectionError("Render worker closed the connection without a response")
+    return json.loads(line)
+
+
+def _parse_value(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm render worker for manim scene scripts")
+    parser.add_argument("--host", default=WORKER_HOST)
+    parser.add_argument("--port", type=int, default=WORKER_PORT)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="warm up and serve jobs")
+    serve_parser.add_argument("--workers", type=int, default=WORKER_PROCESSES,
+                              help="jobs rendered at the same time")
+
+    submit_parser = commands.add_parser("submit", help="render a script on a running worker")
+    submit_parser.add_argument("script")
+    submit_parser.add_argument("--scene", default="CombinedScene")
+    submit_parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                               help="manim config override, e.g. output_file=lesson_42 or pixel_height=480")
+    submit_parser.add_argument("--cwd", default=os.getcwd(),
+                               help="working directory of the job (relative media_dir / TTS cache paths)")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.host, args.port, args.workers)
+    else:
+        overrides = dict(item.split("=", 1) for item in args.set)
+        response = submit_job({
+            "script": os.path.abspath(args.script),
+            "scene": args.scene,
+            "config": {key: _parse_value(value) for key, value in overrides.items()},
+            "cwd": args.cwd,
+        }, args.host, args.port)
+        if response["ok"]:
+            print(f"Rendered {response['output']} in {response['seconds']:.1f}s "
+                  f"(job startup {response['startup_seconds']:.2f}s)")
+        else:
+            print(response["error"])
+            raise SystemExit(1)